@@ -0,0 +1,427 @@
+import argparse
+import datetime
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from PIL import Image
+
+# Benchmark für den NetBox-Export: Ein lokaler Stub der NetBox-API liefert einen synthetischen Tenant
+# konfigurierbarer Größe, nb_export.py läuft dagegen vollständig durch. Gemessen werden Laufzeit,
+# Anzahl Anfragen, übertragene Bytes, maximaler Speicherbedarf (RSS) und erzeugte PDF-Seiten.
+
+TENANT_ID = 1
+LAST_UPDATED = '2024-01-01T00:00:00+00:00'
+MAX_PAGE_SIZE = 1000
+
+
+def nested(record):
+    return {'id': record['id'], 'name': record['name']}
+
+
+def termination(object_type, component):
+    return {
+        'object_type': object_type,
+        'object_id': component['id'],
+        'object': {'id': component['id'], 'name': component['name'], 'device': component['device']},
+    }
+
+
+# Komponenten-Felder eines Geräts in GraphQL und die zugehörigen Sammlungen des Stubs
+GRAPHQL_COMPONENTS = {'interfaces': 'interfaces', 'frontports': 'front-ports', 'rearports': 'rear-ports'}
+GRAPHQL_TYPES = {'dcim.interface': 'InterfaceType', 'dcim.frontport': 'FrontPortType', 'dcim.rearport': 'RearPortType'}
+
+
+# Auswahlfelder liefert GraphQL ohne Label, Objekt-IDs als Strings
+def graphql_rack(rack):
+    return dict(rack, id=str(rack['id']), width=rack['width']['value'], status=rack['status']['value'],
+                site={'id': str(rack['site']['id']), 'name': rack['site']['name']},
+                tenant={'id': str(rack['tenant']['id'])})
+
+
+def graphql_termination(termination):
+    component = termination['object']
+    return {'__typename': GRAPHQL_TYPES[termination['object_type']], 'id': str(component['id']),
+            'name': component['name'], 'device': {'id': str(component['device']['id']),
+                                                  'name': component['device']['name']}}
+
+
+def graphql_component(data, component):
+    record = dict(component, id=str(component['id']), type=component['type']['value'])
+    if component['cable']:
+        cable = data.collections['cables'][component['cable']['id']]
+        record['cable'] = dict(cable, id=str(cable['id']), length_unit=cable['length_unit']['value'],
+                               a_terminations=[graphql_termination(item) for item in cable['a_terminations']],
+                               b_terminations=[graphql_termination(item) for item in cable['b_terminations']])
+    if component.get('rear_port'):
+        record['rear_port'] = dict(component['rear_port'], id=str(component['rear_port']['id']))
+    return record
+
+
+# Front- und Rückansicht eines Gerätetyps (1 HE, 19 Zoll) in einer Farbe
+def device_type_image(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (1200, 120), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+# Synthetische Tenants: jeder Tenant hat sites Sites, jede Site racks Racks, jedes Rack ein Patchpanel und
+# devices Switches. Patchpanels und Switches haben je einen Gerätetyp mit Bildern. Ein Anteil cable_density der
+# Switch-Interfaces ist mit Front-Ports des Patchpanels verkabelt, die Rear-Ports von je zwei benachbarten Racks
+# sind untereinander verbunden.
+class FixtureData:
+    def __init__(self, sites=2, racks=2, devices=4, ports=24, cable_density=0.5, tenants=1):
+        self.collections = {name: {} for name in ('tenants', 'sites', 'racks', 'devices', 'interfaces', 'front-ports',
+                                                  'rear-ports', 'cables', 'device-types')}
+        self.by_device = {name: defaultdict(list) for name in ('interfaces', 'front-ports', 'rear-ports', 'cables')}
+        self.ids = Counter()
+        # Pfad → Bilddaten, die Gerätetypen verweisen mit relativen Pfaden darauf
+        self.media = {}
+        self.device_types = {}
+        for role, color in (('Patchpanel', (90, 90, 90)), ('Switch', (30, 80, 160))):
+            device_type = self.add('device-types', {'u_height': 1}, role)
+            device_type['model'] = f'{role} Model'
+            for side in ('front', 'rear'):
+                path = f'/media/devicetype-images/{device_type["id"]}-{side}.png'
+                self.media[path] = device_type_image(color if side == 'front' else tuple(c // 2 for c in color))
+                device_type[f'{side}_image'] = path
+            self.device_types[role] = device_type
+        for _ in range(tenants):
+            tenant = self.add('tenants', {'description': 'Synthetic'}, 'Benchmark Tenant')
+            tenant['slug'] = f'benchmark-{tenant["id"]}'
+            self.add_sites(tenant, sites, racks, devices, ports, cable_density)
+
+    def add_sites(self, tenant, sites, racks, devices, ports, cable_density):
+        for _ in range(sites):
+            site = self.add('sites', {
+                'slug': '', 'tenant': nested(tenant), 'description': '', 'physical_address': '', 'facility': '',
+                'asns': [], 'time_zone': None, 'latitude': None, 'longitude': None, 'region': None,
+                'circuit_count': 0, 'device_count': racks * (devices + 1), 'prefix_count': 0, 'rack_count': racks,
+                'virtualmachine_count': 0, 'vlan_count': 0,
+            }, 'Site')
+            previous_panel = None
+            for _ in range(racks):
+                rack = self.add('racks', {
+                    'site': nested(site), 'tenant': site['tenant'], 'facility_id': None, 'type': None,
+                    'width': {'value': 19, 'label': '19 inches'}, 'u_height': 42,
+                    'status': {'value': 'active', 'label': 'Active'}, 'serial': '', 'asset_tag': None, 'role': None,
+                    'comments': '',
+                }, 'Rack')
+                panel = self.add_device(site, rack, 'Patchpanel', 1)
+                rear_ports = [self.add_component('rear-ports', panel, {'positions': 1}) for _ in range(ports)]
+                front_ports = [self.add_component('front-ports', panel, {
+                    'rear_port': nested(rear_port), 'rear_port_position': 1,
+                }) for rear_port in rear_ports]
+                free_front_ports = iter(front_ports)
+
+                for position in range(devices):
+                    switch = self.add_device(site, rack, 'Switch', position + 2)
+                    interfaces = [self.add_component('interfaces', switch, {
+                        'untagged_vlan': None, 'tagged_vlans': [], 'ip_addresses': [],
+                    }) for _ in range(ports)]
+                    for interface in interfaces[:int(ports * cable_density)]:
+                        front_port = next(free_front_ports, None)
+                        if front_port is None:
+                            break
+                        self.add_cable(('dcim.interface', interface), ('dcim.frontport', front_port))
+
+                # Ein Rear-Port hat nur ein Kabel, deshalb werden die Panels paarweise verbunden
+                if previous_panel is not None:
+                    previous_rear_ports = self.by_device['rear-ports'][previous_panel['id']]
+                    for a, b in list(zip(previous_rear_ports, rear_ports))[:int(ports * cable_density)]:
+                        self.add_cable(('dcim.rearport', a), ('dcim.rearport', b))
+                    previous_panel = None
+                else:
+                    previous_panel = panel
+
+    def add(self, collection, record, prefix):
+        self.ids[collection] += 1
+        record = dict(record, id=self.ids[collection], last_updated=LAST_UPDATED)
+        record.setdefault('name', f'{prefix}-{record["id"]}')
+        self.collections[collection][record['id']] = record
+        return record
+
+    def add_device(self, site, rack, role, position):
+        return self.add('devices', {
+            'device_type': {'id': self.device_types[role]['id'], 'model': f'{role} Model'}, 'role': {'id': 1, 'name': role},
+            'tenant': site['tenant'], 'serial': '', 'asset_tag': None, 'site': nested(site), 'location': None,
+            'rack': nested(rack), 'position': position, 'face': {'value': 'front', 'label': 'Front'},
+            'custom_fields': {},
+        }, role)
+
+    def add_component(self, collection, device, fields):
+        component = self.add(collection, dict(fields, device=nested(device), cable=None,
+                                              type={'value': '8p8c', 'label': '8P8C'}),
+                             'port')
+        component['name'] = f'port{len(self.by_device[collection][device["id"]]) + 1}'
+        self.by_device[collection][device['id']].append(component)
+        return component
+
+    def add_cable(self, a, b):
+        cable = self.add('cables', {
+            'type': 'cat6', 'length': 2, 'length_unit': {'value': 'm', 'label': 'Meters'}, 'color': 'f44336',
+            'a_terminations': [termination(*a)], 'b_terminations': [termination(*b)],
+        }, 'Cable')
+        for _, component in (a, b):
+            component['cable'] = {'id': cable['id']}
+            self.by_device['cables'][component['device']['id']].append(cable)
+
+    # Objekte einer Liste anhand der NetBox-Filter auswählen
+    def query(self, collection, filters):
+        device_ids = [int(value) for value in filters.get('device_id', [])]
+        if device_ids and collection in self.by_device:
+            records = [record for device_id in sorted(set(device_ids))
+                       for record in self.by_device[collection].get(device_id, [])]
+            if collection == 'cables':
+                records = list({cable['id']: cable for cable in records}.values())
+        else:
+            records = list(self.collections[collection].values())
+
+        for key, getter in (('id', lambda record: record['id']),
+                            ('device_id', lambda record: record['id']),
+                            ('tenant_id', lambda record: (record.get('tenant') or {}).get('id')),
+                            ('site_id', lambda record: (record.get('site') or {}).get('id')),
+                            ('rack_id', lambda record: (record.get('rack') or {}).get('id'))):
+            if key in filters and not (key == 'device_id' and collection in self.by_device):
+                values = {int(value) for value in filters[key]}
+                records = [record for record in records if getter(record) in values]
+        if 'last_updated__gte' in filters:
+            since = datetime.datetime.fromisoformat(filters['last_updated__gte'][0])
+            records = [record for record in records
+                       if datetime.datetime.fromisoformat(record['last_updated']) >= since]
+        return records
+
+
+# Stub der NetBox-REST-API mit künstlicher Latenz und Zählern für Anfragen und Bytes
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, data, latency=0.0, page_size=50):
+        super().__init__(('127.0.0.1', 0), FixtureHandler)
+        self.data = data
+        self.latency = latency
+        self.page_size = page_size
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.bytes = 0
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/api/'
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        if url.path.startswith('/media/'):
+            return self.send_media(url.path)
+        filters = parse_qs(url.query)
+        path = url.path[len('/api/'):].strip('/')
+        endpoint = re.sub(r'/\d+$', '/<id>', path)
+        with self.server.lock:
+            self.server.requests[endpoint] += 1
+
+        data = self.server.data
+        detail = re.match(r'(.+)/(\d+)$', path)
+        if detail and detail.group(1).split('/')[-1] in data.collections:
+            record = data.collections[detail.group(1).split('/')[-1]].get(int(detail.group(2)))
+            return self.send(record, 200) if record else self.send({'detail': 'Not found.'}, 404)
+        if path in ('core/object-changes', 'extras/object-changes'):
+            return self.send_page(url, filters, [])
+        collection = path.split('/')[-1]
+        if collection not in data.collections:
+            return self.send({'detail': 'Not found.'}, 404)
+
+        records = data.query(collection, filters)
+        if collection == 'device-types':
+            # NetBox liefert Bilder als absolute URLs
+            records = [dict(record, **{key: f'http://{self.headers["Host"]}{record[key]}'
+                                       for key in ('front_image', 'rear_image')}) for record in records]
+        if 'brief' in filters:
+            records = [{'id': record['id'], 'name': record.get('name')} for record in records]
+        elif 'fields' in filters:
+            fields = set(filters['fields'][0].split(','))
+            records = [{key: value for key, value in record.items() if key in fields} for record in records]
+        return self.send_page(url, filters, records)
+
+    # GraphQL-Abfragen von nb_export.py: Aliase sN: site(id: N) und dN: device(id: N). Die Auswahl der Felder
+    # wird nicht ausgewertet, es wird immer der vollständige Baum geliefert.
+    def do_POST(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            self.server.requests['graphql'] += 1
+        if urlparse(self.path).path.strip('/') != 'graphql':
+            return self.send({'detail': 'Not found.'}, 404)
+
+        data = self.server.data
+        result = {}
+        for alias, kind, object_id in re.findall(r'(\w+): (site|device)\(id: (\d+)\)', body['query']):
+            object_id = int(object_id)
+            if kind == 'site':
+                racks = data.query('racks', {'site_id': [object_id]})
+                result[alias] = {'racks': [graphql_rack(rack) for rack in racks]}
+            else:
+                result[alias] = {collection: [graphql_component(data, component)
+                                              for component in data.by_device[endpoint].get(object_id, [])]
+                                 for collection, endpoint in GRAPHQL_COMPONENTS.items()}
+        return self.send({'data': result})
+
+    # Bilder mit ETag, bei passendem If-None-Match ohne Inhalt (304)
+    def send_media(self, path):
+        with self.server.lock:
+            self.server.requests['media'] += 1
+        content = self.server.data.media.get(path)
+        if content is None:
+            return self.send({'detail': 'Not found.'}, 404)
+        etag = f'"{hashlib.sha256(content).hexdigest()[:16]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        with self.server.lock:
+            self.server.bytes += len(content)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_page(self, url, filters, records):
+        limit = int(filters.get('limit', [self.server.page_size])[0]) or MAX_PAGE_SIZE
+        limit = min(limit, MAX_PAGE_SIZE)
+        offset = int(filters.get('offset', [0])[0])
+        next_url = None
+        if offset + limit < len(records):
+            params = dict(filters, limit=[str(limit)], offset=[str(offset + limit)])
+            next_url = f'http://{self.headers["Host"]}{url.path}?{urlencode(params, doseq=True)}'
+        self.send({'count': len(records), 'next': next_url, 'previous': None,
+                   'results': records[offset:offset + limit]})
+
+    def send(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        with self.server.lock:
+            self.server.bytes += len(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def count_pdf_pages(path):
+    with open(path, 'rb') as file:
+        return len(re.findall(rb'/Type\s*/Page(?!s)', file.read()))
+
+
+# Einen Export-Lauf als eigenen Prozess gegen den Stub ausführen
+def run_export(server, script, export_args, work_dir):
+    env = dict(os.environ, NETBOX_URL=server.url, NETBOX_TOKEN='benchmark', TENANT_ID=str(TENANT_ID))
+    for pdf_file in glob.glob(os.path.join(work_dir, '*.pdf')):
+        os.remove(pdf_file)
+    with server.lock:
+        server.requests.clear()
+        server.bytes = 0
+
+    with tempfile.TemporaryFile('w+') as output:
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, script, *export_args], cwd=work_dir, env=env, stdout=output,
+                                   stderr=subprocess.STDOUT, text=True)
+        # wait4 liefert den Ressourcenverbrauch dieses Laufs (einschließlich seiner Worker-Prozesse),
+        # RUSAGE_CHILDREN dagegen das Maximum aller bisher beendeten Läufe
+        _, status, usage = os.wait4(process.pid, 0)
+        wall_time = time.perf_counter() - started
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if process.returncode != 0:
+            output.seek(0)
+            print(output.read())
+            raise SystemExit(f'Export fehlgeschlagen mit Exit-Code {process.returncode}')
+
+    # Ältere Versionen schreiben test.pdf als Kopie des Berichts, sie wird nicht mitgezählt
+    pdf_files = [path for path in glob.glob(os.path.join(work_dir, '*.pdf')) if os.path.basename(path) != 'test.pdf']
+    return {
+        'wall_time': wall_time,
+        'requests': sum(server.requests.values()),
+        'requests_by_endpoint': dict(server.requests),
+        'bytes': server.bytes,
+        # ru_maxrss ist unter Linux in KiB angegeben
+        'peak_rss_mb': usage.ru_maxrss / 1024,
+        'pages': sum(count_pdf_pages(path) for path in pdf_files),
+    }
+
+
+def print_report(results):
+    print(f"{'run':>4} {'wall time':>10} {'requests':>9} {'bytes':>12} {'peak RSS':>10} {'pages':>7}")
+    for number, result in enumerate(results, 1):
+        print(f"{number:>4} {result['wall_time']:>9.2f}s {result['requests']:>9} {result['bytes']:>12} "
+              f"{result['peak_rss_mb']:>8.1f}MB {result['pages']:>7}")
+    endpoints = Counter()
+    for result in results:
+        endpoints.update(result['requests_by_endpoint'])
+    print('\nrequests per endpoint (all runs):')
+    for endpoint, count in endpoints.most_common():
+        print(f'  {endpoint:<30} {count:>7}')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark nb_export.py against a synthetic NetBox stub')
+    parser.add_argument('--tenants', type=int, default=1)
+    parser.add_argument('--sites', type=int, default=2, help='Sites per tenant')
+    parser.add_argument('--racks', type=int, default=2, help='Racks per site')
+    parser.add_argument('--devices', type=int, default=4, help='Switches per rack (plus one patch panel)')
+    parser.add_argument('--ports', type=int, default=24, help='Ports per device')
+    parser.add_argument('--cable-density', type=float, default=0.5, help='Share of ports with a cable (0-1)')
+    parser.add_argument('--latency', type=float, default=0, help='Latency per request in milliseconds')
+    parser.add_argument('--page-size', type=int, default=50, help='Default page size of the stub')
+    parser.add_argument('--runs', type=int, default=1)
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    parser.add_argument('--script', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nb_export.py'),
+                        help='Export script to run, e.g. from another checkout for comparisons')
+    parser.add_argument('export_args', nargs=argparse.REMAINDER,
+                        help='Arguments passed to nb_export.py (after --)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    export_args = [arg for arg in args.export_args if arg != '--']
+    data = FixtureData(args.sites, args.racks, args.devices, args.ports, args.cable_density, args.tenants)
+    server = FixtureServer(data, latency=args.latency / 1000, page_size=args.page_size)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for _ in range(args.runs):
+            results.append(run_export(server, os.path.abspath(args.script), export_args, work_dir))
+    server.shutdown()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'parameters': vars(args), 'results': results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Verbindungsgraph für Kabelwege über Patchpanels. Er wird einmal aus Kabeln, Front- und Rear-Ports aufgebaut,
+# danach wird jeder Weg ohne weitere Anfragen Kabel für Kabel verfolgt:
+# Interface → Kabel → Front-Port → Rear-Port → Kabel → Rear-Port → Front-Port → Kabel → Endpunkt.
+
+# Objekttypen der Kabelenden je Komponenten-Sammlung
+COMPONENT_TYPES = {
+    'interfaces': 'dcim.interface',
+    'frontports': 'dcim.frontport',
+    'rearports': 'dcim.rearport',
+}
+
+# Obergrenze für die Anzahl Kabel eines Weges, schützt vor Schleifen in fehlerhaften Daten
+MAX_HOPS = 32
+
+
+class CablePathGraph:
+    def __init__(self):
+        # Kabelende (Objekttyp, ID) → Kabel-ID
+        self.port_cables = {}
+        # Kabel-ID → (Kabelenden A, Kabelenden B)
+        self.cable_ends = {}
+        # Kabelende → Objekt am Kabelende (Port mit Gerät), für die Namen von Endpunkt und Patchpanels
+        self.objects = {}
+        # Front-Port-ID → (Rear-Port-ID, Position) und umgekehrt
+        self.front_to_rear = {}
+        self.rear_to_front = {}
+        # Rear-Port-ID → Anzahl Positionen
+        self.rear_positions = {}
+
+    def add_cable(self, cable):
+        if cable['id'] in self.cable_ends:
+            return
+        ends = []
+        for side in ('a_terminations', 'b_terminations'):
+            keys = []
+            for termination in cable[side]:
+                key = (termination['object_type'], termination['object_id'])
+                self.objects[key] = termination['object']
+                self.port_cables[key] = cable['id']
+                keys.append(key)
+            ends.append(keys)
+        self.cable_ends[cable['id']] = tuple(ends)
+
+    def add_front_port(self, port):
+        if port.get('rear_port'):
+            position = port.get('rear_port_position') or 1
+            self.front_to_rear[port['id']] = (port['rear_port']['id'], position)
+            self.rear_to_front[(port['rear_port']['id'], position)] = port['id']
+
+    def add_rear_port(self, port):
+        self.rear_positions[port['id']] = port.get('positions') or 1
+
+    # Kabelenden auf der Gegenseite des Kabels an einem Port
+    def get_far_ends(self, key):
+        cable_id = self.port_cables.get(key)
+        if cable_id is None:
+            return []
+        a_ends, b_ends = self.cable_ends[cable_id]
+        return b_ends if key in a_ends else a_ends
+
+    # Weg vom Kabel eines Ports bis zum Endpunkt verfolgen. Gibt das Kabelende am Endpunkt und die Kabelenden der
+    # Patchpanels dazwischen zurück. Endet der Weg an einem Patchpanel ohne weiteres Kabel oder fehlen Daten, ist dieses
+    # Panel der Endpunkt. Kabel mit mehreren Enden auf einer Seite werden nicht verfolgt (None).
+    def trace(self, object_type, port_id):
+        key = (object_type, port_id)
+        position = None
+        via = []
+        far_end = None
+        for _ in range(MAX_HOPS):
+            far_ends = self.get_far_ends(key)
+            if len(far_ends) != 1:
+                return None, via
+            far_end = far_ends[0]
+            far_type, far_id = far_end
+            if far_type == 'dcim.frontport' and far_id in self.front_to_rear:
+                rear_id, position = self.front_to_rear[far_id]
+                next_key = ('dcim.rearport', rear_id)
+            elif far_type == 'dcim.rearport':
+                # Ohne Position aus dem bisherigen Weg ist nur ein Rear-Port mit einer Position eindeutig
+                if position is None and self.rear_positions.get(far_id) == 1:
+                    position = 1
+                front_id = self.rear_to_front.get((far_id, position))
+                if front_id is None:
+                    return far_end, via
+                next_key = ('dcim.frontport', front_id)
+                position = None
+            else:
+                return far_end, via
+            if next_key not in self.port_cables:
+                return far_end, via
+            via.append(far_end)
+            key = next_key
+        return far_end, via
@@ -0,0 +1,189 @@
+import csv
+import datetime
+import json
+import os
+
+from export_helper import get_color_name_from_hex_direct
+from export_model import Site
+from metrics import metrics
+
+# Maschinenlesbare Exporte für Inventarabgleich und Kabel-Audits. Sie lesen dieselben Modell-Objekte aus der
+# Collector-Queue wie der PDF-Renderer und schreiben jede Zeile sofort, sodass auch sehr große Tenants nicht
+# vollständig im Speicher liegen.
+
+# Tabellen und ihre Spalten in Ausgabereihenfolge
+TABLES = {
+    'devices': ('tenant', 'site', 'location', 'rack', 'position', 'face', 'name', 'device_type', 'role', 'serial',
+                'asset_tag'),
+    'ports': ('device', 'kind', 'name', 'type', 'vlans', 'ip_addresses', 'cable_id', 'connected_device',
+              'connected_port', 'via', 'cable_type', 'length', 'length_unit', 'color', 'color_name'),
+    'cables': ('id', 'a_device', 'a_port', 'b_device', 'b_port', 'type', 'length', 'length_unit', 'color',
+               'color_name'),
+}
+
+# Port-Sammlungen eines Geräts und ihre Bezeichnung in der Spalte kind
+PORT_KINDS = (('interfaces', 'interface'), ('frontports', 'frontport'), ('rearports', 'rearport'))
+
+
+# Geräte der Standorte in Ausgabereihenfolge. Die Zeit bis zum nächsten Standort zählt als Rendern des
+# Standorts, das Warten auf den Collector nicht.
+def iter_devices(items):
+    for item in items:
+        kind = 'site' if isinstance(item, Site) else 'device'
+        with metrics.stage('render'), metrics.section('render', kind, item.name):
+            if isinstance(item, Site):
+                for rack in item.racks:
+                    yield from rack.devices
+                yield from item.devices
+            else:
+                yield item
+
+
+def get_cable_fields(cable, type_column='type'):
+    return {
+        type_column: cable.type,
+        'length': cable.length,
+        'length_unit': cable.length_unit,
+        'color': cable.color,
+        'color_name': get_color_name_from_hex_direct(cable.color),
+    }
+
+
+# Funktion, um aus dem Modell Zeilen (Tabelle, Werte) zu erzeugen. Kabel zwischen zwei Geräten des Tenants
+# werden nur beim ersten Gerät ausgegeben, ihre Seiten A und B entsprechen den Kabelenden in NetBox.
+def iter_rows(tenant, items):
+    cable_ids = set()
+    for device in iter_devices(items):
+        yield 'devices', {
+            'tenant': tenant.name,
+            'site': device.site,
+            'location': device.location,
+            'rack': device.rack,
+            'position': device.position,
+            'face': device.face,
+            'name': device.name,
+            'device_type': device.device_type,
+            'role': device.role,
+            'serial': device.serial,
+            'asset_tag': device.asset_tag,
+        }
+        for collection, kind in PORT_KINDS:
+            for port in getattr(device, collection):
+                row = {
+                    'device': device.name,
+                    'kind': kind,
+                    'name': port.name,
+                    'type': port.type,
+                    'vlans': port.vlans,
+                    'ip_addresses': ', '.join(port.ip_addresses),
+                    'cable_id': port.cable.id if port.cable else None,
+                    'connected_device': port.connected_to,
+                    'connected_port': port.connected_port,
+                    'via': ', '.join(port.via),
+                }
+                if port.cable:
+                    row.update(get_cable_fields(port.cable, 'cable_type'))
+                yield 'ports', row
+
+                if port.cable and port.cable.id not in cable_ids:
+                    cable_ids.add(port.cable.id)
+                    yield 'cables', dict(id=port.cable.id, a_device=port.cable.a_device, a_port=port.cable.a_port,
+                                         b_device=port.cable.b_device, b_port=port.cable.b_port,
+                                         **get_cable_fields(port.cable))
+
+
+# Gemeinsame Basis der Exporte mit einer Datei pro Tabelle (self.files)
+class TableFilesWriter:
+    def close(self):
+        for file in self.files.values():
+            file.close()
+
+    # Unvollständige Dateien eines abgebrochenen Exports löschen
+    def discard(self):
+        self.close()
+        for file in self.files.values():
+            os.remove(file.name)
+
+    def get_paths(self):
+        return [file.name for file in self.files.values()]
+
+
+# CSV: eine Datei pro Tabelle
+class CsvWriter(TableFilesWriter):
+    def __init__(self, base_name):
+        self.files = {}
+        self.writers = {}
+        for table, columns in TABLES.items():
+            self.files[table] = open(f'{base_name}_{table}.csv', 'w', newline='', encoding='utf-8')
+            self.writers[table] = csv.DictWriter(self.files[table], fieldnames=columns)
+            self.writers[table].writeheader()
+
+    def write(self, table, row):
+        self.writers[table].writerow(row)
+
+
+# JSON Lines: eine Datei pro Tabelle, ein Objekt pro Zeile
+class JsonlWriter(TableFilesWriter):
+    def __init__(self, base_name):
+        self.files = {table: open(f'{base_name}_{table}.jsonl', 'w', encoding='utf-8') for table in TABLES}
+
+    def write(self, table, row):
+        self.files[table].write(json.dumps({column: row.get(column) for column in TABLES[table]},
+                                           ensure_ascii=False) + '\n')
+
+
+# XLSX: eine Arbeitsmappe mit einem Blatt pro Tabelle. openpyxl ist optional und wird nur für diesen Export
+# benötigt; im write-only-Modus landen die Zeilen direkt in temporären Dateien statt im Speicher.
+class XlsxWriter:
+    def __init__(self, base_name):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise SystemExit('Für den XLSX-Export wird openpyxl benötigt: pip install openpyxl')
+        self.path = f'{base_name}.xlsx'
+        self.workbook = Workbook(write_only=True)
+        self.sheets = {}
+        for table, columns in TABLES.items():
+            self.sheets[table] = self.workbook.create_sheet(table)
+            self.sheets[table].append(columns)
+
+    def write(self, table, row):
+        self.sheets[table].append([row.get(column) for column in TABLES[table]])
+
+    def close(self):
+        self.workbook.save(self.path)
+
+    # Abgebrochener Export: die Blätter schließen, ohne die Arbeitsmappe zu speichern. Ihre temporären Dateien
+    # entfernt openpyxl beim Beenden.
+    def discard(self):
+        for sheet in self.sheets.values():
+            sheet.close()
+
+    def get_paths(self):
+        return [self.path]
+
+
+EXPORTERS = {
+    'csv': CsvWriter,
+    'jsonl': JsonlWriter,
+    'xlsx': XlsxWriter,
+}
+
+
+# Funktion, um den Tenant im gewählten Format zu exportieren. items liefert wie beim PDF zuerst den Tenant.
+def export_to_rows(items, output_format):
+    items = iter(items)
+    tenant = next(items, None)
+    if tenant is None:
+        return
+
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    writer = EXPORTERS[output_format](f"{tenant.name}_{timestamp}")
+    try:
+        for table, row in iter_rows(tenant, items):
+            writer.write(table, row)
+    except BaseException:
+        writer.discard()
+        raise
+    writer.close()
+    print(f"Export wurde erfolgreich als {', '.join(writer.get_paths())} erstellt.")
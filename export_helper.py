@@ -1,15 +1,61 @@
-import io
-import requests
-from PIL import Image
-
-def get_image_from_url(url):
-    print(url)
-    response = requests.get(url)
-    if response.status_code == 200:
-        return Image.open(io.BytesIO(response.content))
+import threading
+
+
+def get_interface_vlans(interface):
+    interface_vlans = ""
+
+    try:
+        for vlan in interface['untagged_vlan']:
+            interface_vlans += f"{vlan['vid']}U,"
+    except (KeyError, TypeError):
+        pass
+
+    try:
+        for vlan in interface['tagged_vlans']:
+            interface_vlans += f"{vlan['vid']}T,"
+    except (KeyError, TypeError):
+        pass
+
+    return interface_vlans[:-1] if interface_vlans else interface_vlans
+
+
+# Get Color name from HEX value
+def get_color_name_from_hex_direct(hex_color):
+    switch = {
+        "aa1409": "Dark Red",
+        "f44336": "Red",
+        "e91e63": "Pink",
+        "ffe4e1": "Rose",
+        "ff66ff": "Fuchsia",
+        "9c27b0": "Purple",
+        "673ab7": "Dark Purple",
+        "3f51b5": "Indigo",
+        "2196f3": "Blue",
+        "03a9f4": "Light Blue",
+        "00bcd4": "Cyan",
+        "009688": "Teal",
+        "00ffff": "Aqua",
+        "2f6a31": "Dark Green",
+        "4caf50": "Green",
+        "8bc34a": "Light Green",
+        "cddd39": "Lime",
+        "ffeb3b": "Yellow",
+        "ffc107": "Amber",
+        "ff9800": "Orange",
+        "ff5722": "Dark Orange",
+        "795548": "Brown",
+        "c0c0c0": "Light Grey",
+        "9e9e9e": "Grey",
+        "607d8b": "Dark Grey",
+        "111111": "Black",
+        "ffffff": "White"
+    }
+
+    if hex_color:
+        #print(f"'{hex_color}' matched to '{switch.get(hex_color.lower(), 'Unknown Color')}'")
+        return switch.get(hex_color.lower(), "Unknown Color")
     else:
-        print(f'Fehler beim Abrufen des Bildes: {response.status_code} [get_image_from_url(url), {url}]')
-        return None
+        return "N/A"
 
 
 # Get connected termination of a cable
@@ -21,3 +67,56 @@ def get_connected_termination(device_id, cable):
         if termination['object']['device']['id'] != device_id:
             return termination
     return None
+
+
+# Cache für Kabeldetails, damit jedes Kabel pro Lauf höchstens einmal abgerufen wird.
+class CableCache:
+    def __init__(self, fetcher):
+        self.fetcher = fetcher
+        self.cables = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.cables)
+
+    def __contains__(self, cable_id):
+        return cable_id in self.cables
+
+    # Kabel ohne Abruf in den Cache legen, z.B. aus einer Bulk-Abfrage
+    def put(self, cable):
+        with self.lock:
+            self.cables[cable['id']] = cable
+
+    # Bereits bekannte Kabel übernehmen, z.B. aus dem Snapshot oder einer Bulk-Abfrage
+    def preload(self, cables):
+        for cable in cables:
+            self.put(cable)
+
+    # Kabel aus dem Cache holen oder bei einem Fehlschlag über den Fetcher abrufen
+    def get(self, cable_id):
+        with self.lock:
+            cable = self.cables.get(cable_id)
+            if cable is not None:
+                self.hits += 1
+                return cable
+            self.misses += 1
+        cable = self.fetcher(cable_id)
+        if cable is not None:
+            self.put(cable)
+        return cable
+
+    # Kabel holen und die Gegenseite aus Sicht des Geräts bestimmen
+    def get_termination(self, device_id, cable_id):
+        cable = self.get(cable_id)
+        if cable is None:
+            return None, None
+        return cable, get_connected_termination(device_id, cable)
+
+    def stats(self):
+        return {
+            'size': len(self.cables),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
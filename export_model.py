@@ -0,0 +1,233 @@
+from dataclasses import dataclass, field
+
+from cable_paths import COMPONENT_TYPES
+from export_helper import get_interface_vlans
+
+# Kompaktes Export-Modell zwischen Collector (NetBox-Abfragen) und Renderer (PDF).
+# Es enthält nur die Felder, die der Bericht tatsächlich ausgibt.
+
+
+@dataclass(slots=True)
+class Tenant:
+    id: int
+    name: str
+    slug: str
+    description: str
+
+
+@dataclass(slots=True)
+class Cable:
+    id: int
+    type: str
+    length: float | None
+    length_unit: str | None
+    color: str
+    # Geräte und Ports der Kabelenden A und B wie in NetBox, mehrere Abschlüsse einer Seite durch Komma getrennt
+    a_device: str | None = None
+    a_port: str | None = None
+    b_device: str | None = None
+    b_port: str | None = None
+
+
+@dataclass(slots=True)
+class Port:
+    id: int
+    name: str
+    type: str
+    cable: Cable | None = None
+    # Endpunkt des Kabelwegs, bei Wegen über Patchpanels das Gerät am anderen Ende
+    connected_to: str | None = None
+    connected_port: str | None = None
+    # Patchpanels zwischen dem Port und dem Endpunkt
+    via: list[str] = field(default_factory=list)
+    # Unmittelbare Gegenseite des Kabels
+    peer_device: str | None = None
+    peer_port: str | None = None
+    vlans: str = ''
+    ip_addresses: list[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Device:
+    id: int
+    name: str
+    device_type: str
+    role: str
+    serial: str
+    asset_tag: str | None
+    site: str
+    location: str | None
+    rack: str | None
+    position: float | None
+    face: str | None
+    custom_fields: dict | None
+    # Höhe in Rack-Einheiten und Pfade der Bilder des Gerätetyps, nur mit --images bekannt
+    u_height: float | None = None
+    front_image: str | None = None
+    rear_image: str | None = None
+    interfaces: list[Port] = field(default_factory=list)
+    frontports: list[Port] = field(default_factory=list)
+    rearports: list[Port] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Rack:
+    id: int
+    name: str
+    facility_id: str | None
+    type: str | None
+    width: str
+    u_height: float
+    status: str
+    serial: str
+    asset_tag: str | None
+    role: str | None
+    comments: str
+    devices: list[Device] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Site:
+    id: int
+    name: str
+    description: str
+    physical_address: str
+    facility: str
+    asns: str
+    time_zone: str | None
+    latitude: float | None
+    longitude: float | None
+    region: str | None
+    circuit_count: int
+    device_count: int
+    prefix_count: int
+    rack_count: int
+    virtualmachine_count: int
+    vlan_count: int
+    racks: list[Rack] = field(default_factory=list)
+    # Geräte des Standorts ohne Rack
+    devices: list[Device] = field(default_factory=list)
+
+
+def get_label(value, key='label'):
+    return value[key] if value else None
+
+
+def build_tenant(tenant):
+    return Tenant(id=tenant['id'], name=tenant['name'], slug=tenant['slug'], description=tenant['description'])
+
+
+def build_cable(cable, names):
+    model = Cable(id=cable['id'], type=cable['type'], length=cable['length'],
+                  length_unit=get_label(cable['length_unit'], 'value'), color=cable['color'])
+    model.a_device, model.a_port = get_end_names(cable['a_terminations'], names)
+    model.b_device, model.b_port = get_end_names(cable['b_terminations'], names)
+    return model
+
+
+# Geräte- und Portnamen einer Kabelseite
+def get_end_names(terminations, names):
+    devices, ports = [], []
+    for termination in terminations:
+        device, port = names.get_termination_names(termination['object_type'], termination['object'])
+        if device and device not in devices:
+            devices.append(device)
+        if port:
+            ports.append(port)
+    return ', '.join(devices) or None, ', '.join(ports) or None
+
+
+# Port aus einem Interface, Front- oder Rear-Port bauen. Kabel und Gegenstelle kommen aus dem Kabel-Cache,
+# bereits gebaute Kabel werden über cables wiederverwendet, Namen der Gegenstellen über names (NameIndex). Mit graph
+# wird der Kabelweg über Patchpanels bis zum tatsächlichen Endpunkt verfolgt.
+def build_port(component, device_id, cable_cache, cables, names, graph=None, object_type=None):
+    port = Port(id=component['id'], name=component['name'], type=component['type']['label'],
+                vlans=get_interface_vlans(component),
+                ip_addresses=[ip['address'] for ip in component.get('ip_addresses', [])])
+    if component['cable']:
+        cable, termination = cable_cache.get_termination(device_id, component['cable']['id'])
+        if termination:
+            if cable['id'] not in cables:
+                cables[cable['id']] = build_cable(cable, names)
+            port.cable = cables[cable['id']]
+            port.peer_device, port.peer_port = names.get_termination_names(termination['object_type'],
+                                                                           termination['object'])
+            port.connected_to, port.connected_port = port.peer_device, port.peer_port
+            if graph is not None:
+                graph.add_cable(cable)
+                endpoint, via = graph.trace(object_type, component['id'])
+                if endpoint and via:
+                    port.connected_to, port.connected_port = names.get_termination_names(endpoint[0],
+                                                                                         graph.objects[endpoint])
+                    port.via = [names.get_termination_names(key[0], graph.objects[key])[0] for key in via]
+    return port
+
+
+# Gerät bauen. Namen von Standort, Rack und Gerätetyp kommen über names aus dem Snapshot. Mit images werden Höhe
+# und Bilder aus dem Gerätetyp übernommen, images liefert zu jeder Bild-URL den Pfad der zwischengespeicherten Datei.
+def build_device(device, components, cable_cache, cables, names, graph=None, device_types=None, images=None):
+    model = Device(
+        id=device['id'],
+        name=device['name'],
+        device_type=names.get('device_types', device['device_type'], 'model'),
+        role=device['role']['name'],
+        serial=device['serial'],
+        asset_tag=device['asset_tag'],
+        site=names.get('sites', device['site']),
+        location=get_label(device['location'], 'name'),
+        rack=names.get('racks', device['rack']),
+        position=device['position'],
+        face=get_label(device['face']),
+        custom_fields=device.get('custom_fields'),
+    )
+    for collection, object_type in COMPONENT_TYPES.items():
+        ports = [build_port(component, device['id'], cable_cache, cables, names, graph, object_type)
+                 for component in components[collection].get(device['id'], {}).values()]
+        setattr(model, collection, ports)
+    device_type = (device_types or {}).get(device['device_type']['id'])
+    if device_type and images is not None:
+        model.u_height = device_type['u_height']
+        model.front_image = images.get(device_type['front_image'])
+        model.rear_image = images.get(device_type['rear_image'])
+    return model
+
+
+def build_rack(rack, devices):
+    width = rack['width']
+    return Rack(
+        id=rack['id'],
+        name=rack['name'],
+        facility_id=rack['facility_id'],
+        type=get_label(rack['type']),
+        width=width['label'] if isinstance(width, dict) else str(width),
+        u_height=rack['u_height'],
+        status=rack['status']['label'],
+        serial=rack['serial'],
+        asset_tag=rack['asset_tag'],
+        role=get_label(rack['role'], 'name'),
+        comments=rack['comments'],
+        devices=devices,
+    )
+
+
+def build_site(site, racks, devices):
+    return Site(
+        id=site['id'],
+        name=site['name'],
+        description=site['description'],
+        physical_address=site['physical_address'],
+        facility=site['facility'],
+        asns=', '.join(str(asn['asn']) for asn in site['asns']) if site['asns'] else '',
+        time_zone=site['time_zone'],
+        latitude=site['latitude'],
+        longitude=site['longitude'],
+        region=get_label(site['region'], 'name'),
+        circuit_count=site['circuit_count'],
+        device_count=site['device_count'],
+        prefix_count=site['prefix_count'],
+        rack_count=site['rack_count'],
+        virtualmachine_count=site['virtualmachine_count'],
+        vlan_count=site['vlan_count'],
+        racks=racks,
+        devices=devices,
+    )
@@ -0,0 +1,115 @@
+import gzip
+import hashlib
+import json
+import os
+
+# Cache für gerenderte Abschnitte des PDF-Berichts (Standort, Rack, Gerät). Jeder Abschnitt wird über einen Hash
+# seiner Modell-Daten und des Renderer-Codes gefunden; unveränderte Abschnitte werden beim nächsten Lauf als fertige
+# Seiten eingefügt statt neu gezeichnet. Jeder Tenant hat ein eigenes Verzeichnis, nach einem erfolgreichen Lauf
+# werden nicht mehr verwendete Fragmente dort gelöscht.
+
+
+# Hash über Dateien, z.B. den Quellcode des Renderers: ändert sich das Layout, passen alte Fragmente nicht mehr
+def get_files_hash(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+# Änderungsstand einer Datei, z.B. eines Bildes aus dem Bild-Cache
+def get_file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class FragmentCache:
+    def __init__(self, directory, salt=''):
+        self.directory = directory
+        self.salt = salt
+        # In diesem Lauf gelesene oder geschriebene Fragmente, alle anderen werden von prune() gelöscht
+        self.used = set()
+        # Je laufendem Abschnitt die Schlüssel und Bilder seiner Unterabschnitte. Ein Fragment verweist nur auf
+        # die Fragmente seiner Unterabschnitte; deren Bilder übernimmt es, damit ein Treffer alle prüft.
+        self.children = []
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # Schlüssel eines Abschnitts: Art des Abschnitts (Render-Funktion) und alle Felder des Modells einschließlich
+    # der enthaltenen Racks, Geräte und Ports. Die Dataclasses des Modells geben sie vollständig über repr() aus.
+    def get_key(self, kind, model):
+        return hashlib.sha256(f'{self.salt}\n{kind}\n{model!r}'.encode()).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.directory, f'{key}.json.gz')
+
+    def read(self, key):
+        with gzip.open(self.get_path(key), 'rt', encoding='utf-8') as file:
+            return json.load(file)
+
+    # Fragment laden, None wenn keines vorhanden ist, sich ein verwendetes Bild seitdem geändert hat oder das
+    # Fragment eines Unterabschnitts fehlt
+    def load(self, key):
+        fragment = None
+        if os.path.exists(self.get_path(key)):
+            fragment = self.read(key)
+            if not self.is_valid(fragment):
+                fragment = None
+        if fragment is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.mark_used([key] + fragment['children'], fragment['images'])
+        return fragment
+
+    def is_valid(self, fragment):
+        return (all(get_file_stamp(name) == stamp for name, stamp in fragment['images'].items())
+                and all(os.path.exists(self.get_path(key)) for key in fragment['children']))
+
+    def mark_used(self, keys, images):
+        self.used.update(keys)
+        if self.children:
+            self.children[-1]['keys'].extend(keys)
+            self.children[-1]['images'].update(images)
+
+    # Neu gezeichneten Abschnitt beginnen
+    def begin(self):
+        self.children.append({'keys': [], 'images': {}})
+
+    # Neu gezeichneten Abschnitt abschließen und speichern, fragment ist None, wenn er nicht zwischengespeichert
+    # werden kann
+    def end(self, key, fragment):
+        children = self.children.pop()
+        if fragment is None:
+            self.mark_used(children['keys'], children['images'])
+            return
+        images = {name: get_file_stamp(name) for part in fragment['parts'] if 'page' in part
+                  for name in part['page']['images'].values()}
+        images.update(children['images'])
+        self.save(key, dict(fragment, children=children['keys'], images=images))
+        self.mark_used([key] + children['keys'], images)
+
+    def save(self, key, fragment):
+        path = self.get_path(key)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as file:
+            json.dump(fragment, file, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    # Fragmente löschen, die in diesem Lauf nicht verwendet wurden (entfernte oder geänderte Abschnitte)
+    def prune(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.json.gz') and name[:-len('.json.gz')] not in self.used:
+                os.remove(os.path.join(self.directory, name))
+
+    def stats(self):
+        return {
+            'size': len(self.used),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,127 @@
+import hashlib
+import io
+import json
+import os
+import threading
+
+from PIL import Image
+
+# Bilder der Gerätetypen (Front- und Rückansicht) für Geräteseiten und Rack-Ansichten. Jedes Bild wird einmal
+# heruntergeladen, auf die Zielauflösung verkleinert und als PNG auf der Festplatte abgelegt. Spätere Läufe fragen
+# nur mit ETag nach, ob sich das Bild geändert hat. Der Renderer bekommt den Pfad der Datei, FPDF bettet jede
+# Datei nur einmal ein und verweist auf allen weiteren Seiten auf dasselbe Bildobjekt.
+
+# Auflösung, mit der Bilder im PDF gezeichnet werden
+IMAGE_DPI = 150
+# Größte Breite, in der ein Bild im Bericht gezeichnet wird (mm)
+IMAGE_WIDTH_MM = 120
+
+
+# Bild auf die Zielbreite verkleinern und in einen Modus bringen, den FPDF einbetten kann (RGB, mit Transparenz RGBA)
+def convert_image(content, max_width):
+    image = Image.open(io.BytesIO(content))
+    has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    if image.width > max_width:
+        image = image.resize((max_width, max(1, round(image.height * max_width / image.width))), Image.LANCZOS)
+    return image
+
+
+class ImageCache:
+    def __init__(self, client, cache_dir, offline=False, width_mm=IMAGE_WIDTH_MM, dpi=IMAGE_DPI):
+        self.client = client
+        self.cache_dir = cache_dir
+        # Im Offline-Modus werden nur bereits vorhandene Bilder verwendet
+        self.offline = offline
+        self.max_width = round(width_mm / 25.4 * dpi)
+        # URL → Pfad des verkleinerten Bildes oder None, je URL wird pro Lauf höchstens einmal nachgefragt
+        self.paths = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.downloads = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # Pfade von Bild und Metadaten (URL, ETag) zu einer URL
+    def get_files(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{key}.png'), os.path.join(self.cache_dir, f'{key}.json')
+
+    # Mehrere Bilder parallel laden, z.B. alle Gerätetypen eines Tenants vor dem Bauen des Modells
+    def prefetch(self, executor, urls):
+        urls = {url for url in urls if url and url not in self.paths}
+        for _ in executor.map(self.get, urls):
+            pass
+
+    # Pfad des Bildes zu einer URL, None wenn es kein Bild gibt oder es nicht geladen werden konnte
+    def get(self, url):
+        if not url:
+            return None
+        with self.lock:
+            if url in self.paths:
+                self.hits += 1
+                return self.paths[url]
+            self.misses += 1
+        path = self.load(url)
+        with self.lock:
+            self.paths[url] = path
+        return path
+
+    def load(self, url):
+        image_path, meta_path = self.get_files(url)
+        meta = None
+        if os.path.exists(image_path) and os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as file:
+                meta = json.load(file)
+        if self.offline:
+            return image_path if meta else None
+
+        headers = {'Accept': 'image/*'}
+        if meta and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        response = self.client.get(url, headers=headers)
+        if response is not None and response.status_code == 304 and meta:
+            with self.lock:
+                self.revalidated += 1
+            return image_path
+        if response is None or response.status_code != 200:
+            # Bei Fehlern das zuletzt geladene Bild weiterverwenden
+            with self.lock:
+                self.errors += 1
+            if response is not None:
+                print(f'Fehler beim Abrufen des Bildes: {response.status_code} [ImageCache.load(url), {url}]')
+            return image_path if meta else None
+
+        try:
+            image = convert_image(response.content, self.max_width)
+        except (OSError, Image.DecompressionBombError) as error:
+            # z.B. SVG, das PIL nicht lesen kann
+            print(f'Fehler beim Lesen des Bildes: {error} [ImageCache.load(url), {url}]')
+            with self.lock:
+                self.errors += 1
+            return None
+        # Zuerst in temporäre Dateien schreiben, damit parallele Läufe keine halben Bilder lesen
+        suffix = f'.{os.getpid()}.tmp'
+        image.save(image_path + suffix, 'PNG')
+        os.replace(image_path + suffix, image_path)
+        with open(meta_path + suffix, 'w', encoding='utf-8') as file:
+            json.dump({'url': url, 'etag': response.headers.get('ETag'),
+                       'last_modified': response.headers.get('Last-Modified')}, file)
+        os.replace(meta_path + suffix, meta_path)
+        with self.lock:
+            self.downloads += 1
+        return image_path
+
+    def stats(self):
+        return {
+            'size': len(self.paths),
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'downloads': self.downloads,
+            'errors': self.errors,
+        }
@@ -0,0 +1,210 @@
+import cProfile
+import json
+import math
+import pstats
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Messwerte eines Exports für --metrics/--profile: Anfragen je Endpoint (Anzahl, Latenz, Bytes), Cache-Treffer
+# und die Zeit für Abruf, Modellaufbau und Rendern, auch je Standort, Rack und Gerät. Ohne enabled wird nichts
+# aufgezeichnet, die Aufrufe kosten dann nur eine Abfrage des Flags.
+
+# Anzahl der langsamsten Abschnitte je Art in der Zusammenfassung
+SLOWEST_SECTIONS = 5
+
+
+# Perzentil nach dem Nearest-Rank-Verfahren
+def get_percentile(values, percentile):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(percentile * len(ordered) / 100) - 1)
+    return ordered[index]
+
+
+# Endpoint für die Statistik vereinheitlichen: ohne Host und Query-String, Objekt-IDs durch <id> ersetzt
+def get_endpoint_key(endpoint):
+    if endpoint.startswith(('http://', 'https://')):
+        endpoint = urlsplit(endpoint).path
+    endpoint = endpoint.split('?', 1)[0].strip('/')
+    # Bilder werden je Verzeichnis zusammengefasst
+    if endpoint.startswith('media/'):
+        return re.sub(r'/[^/]+$', '/<file>', endpoint)
+    return re.sub(r'/\d+$', '/<id>', endpoint)
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        # Mit profiling läuft jeder Thread in profile() unter cProfile
+        self.profiling = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # Endpoint → Latenzen in Sekunden, Bytes, Fehler
+        self.latencies = defaultdict(list)
+        self.bytes = defaultdict(int)
+        self.errors = defaultdict(int)
+        # Name → Statistik eines Caches (hits, misses, ...)
+        self.caches = {}
+        # Stufe (fetch, build, render) → Sekunden
+        self.stages = defaultdict(float)
+        # Art (tenant, site, rack, device, batch) → [(Sekunden, Stufe, Name)]
+        self.sections = defaultdict(list)
+        # Beendete cProfile-Läufe der einzelnen Threads
+        self.profiles = []
+
+    def record_request(self, endpoint, seconds, size, failed=False):
+        if not self.enabled:
+            return
+        key = get_endpoint_key(endpoint)
+        with self.lock:
+            self.latencies[key].append(seconds)
+            self.bytes[key] += size
+            if failed:
+                self.errors[key] += 1
+
+    def record_cache(self, name, stats):
+        if not self.enabled:
+            return
+        with self.lock:
+            total = self.caches.setdefault(name, defaultdict(int))
+            for key, value in stats.items():
+                total[key] += value
+
+    # Gesamtzeit einer Stufe messen
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.stages[name] += time.perf_counter() - started
+
+    # Zeit eines einzelnen Abschnitts (z.B. eines Standorts beim Rendern) messen
+    @contextmanager
+    def section(self, stage, kind, name):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.sections[kind].append((time.perf_counter() - started, stage, name))
+
+    # Laufenden Thread mit cProfile messen. cProfile erfasst nur den Thread, in dem es aktiviert wurde,
+    # deshalb ruft jeder Thread (Renderer und Collector) profile() selbst auf.
+    @contextmanager
+    def profile(self):
+        if not self.profiling:
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Ab Python 3.12 kann nur ein Profiler gleichzeitig aktiv sein
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self.lock:
+                self.profiles.append(profiler)
+
+    # Profile aller Threads zusammengefasst im pstats-Format speichern
+    def write_profile(self, path):
+        with self.lock:
+            if not self.profiles:
+                return
+            stats = pstats.Stats(*self.profiles)
+        stats.dump_stats(path)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'requests': {endpoint: {'count': len(latencies), 'errors': self.errors[endpoint],
+                                        'bytes': self.bytes[endpoint], 'latencies': list(latencies)}
+                             for endpoint, latencies in self.latencies.items()},
+                'caches': {name: dict(stats) for name, stats in self.caches.items()},
+                'stages': dict(self.stages),
+                'sections': {kind: list(sections) for kind, sections in self.sections.items()},
+            }
+
+    # Messwerte eines anderen Prozesses übernehmen (Batch-Modus)
+    def merge(self, data):
+        with self.lock:
+            for endpoint, values in data['requests'].items():
+                self.latencies[endpoint].extend(values['latencies'])
+                self.bytes[endpoint] += values['bytes']
+                self.errors[endpoint] += values['errors']
+            for name, stats in data['caches'].items():
+                total = self.caches.setdefault(name, defaultdict(int))
+                for key, value in stats.items():
+                    total[key] += value
+            for name, seconds in data['stages'].items():
+                self.stages[name] += seconds
+            for kind, sections in data['sections'].items():
+                self.sections[kind].extend(tuple(section) for section in sections)
+
+    # Zusammenfassung für die JSON-Ausgabe: Perzentile statt einzelner Latenzen
+    def summary(self):
+        data = self.to_dict()
+        for values in data['requests'].values():
+            latencies = values.pop('latencies')
+            values['total_s'] = sum(latencies)
+            values['p50_ms'] = get_percentile(latencies, 50) * 1000
+            values['p95_ms'] = get_percentile(latencies, 95) * 1000
+            values['max_ms'] = max(latencies, default=0) * 1000
+        data['sections'] = {
+            kind: {
+                'count': len(sections),
+                'total_s': sum(seconds for seconds, _, _ in sections),
+                'slowest': [{'seconds': seconds, 'stage': stage, 'name': name}
+                            for seconds, stage, name in sorted(sections, reverse=True)[:SLOWEST_SECTIONS]],
+            }
+            for kind, sections in data['sections'].items()
+        }
+        return data
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def print_summary(self, wall_time=None):
+        data = self.summary()
+        print(f"\n{'endpoint':<32} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'bytes':>12}")
+        for endpoint, values in sorted(data['requests'].items(), key=lambda item: -item[1]['total_s']):
+            print(f"{endpoint:<32} {values['count']:>8} {values['errors']:>6} {values['p50_ms']:>8.1f} "
+                  f"{values['p95_ms']:>8.1f} {values['max_ms']:>8.1f} {values['bytes']:>12}")
+
+        for name, stats in data['caches'].items():
+            lookups = stats.get('hits', 0) + stats.get('misses', 0)
+            rate = stats.get('hits', 0) / lookups * 100 if lookups else 0
+            details = ', '.join(f'{key} {value}' for key, value in stats.items())
+            print(f'\ncache {name}: {details} ({rate:.1f}% hits)')
+
+        # Abruf und Rendern laufen parallel, die Summe kann daher über der Laufzeit liegen
+        stages = ', '.join(f'{name} {seconds:.2f}s' for name, seconds in data['stages'].items())
+        print(f'\ntime: {stages}' + (f' (wall time {wall_time:.2f}s)' if wall_time is not None else ''))
+
+        for kind, values in data['sections'].items():
+            print(f"\nslowest {kind} ({values['count']} total, {values['total_s']:.2f}s):")
+            for section in values['slowest']:
+                print(f"  {section['seconds']:>8.3f}s  {section['stage']:<7} {section['name']}")
+
+
+# Messwerte des Prozesses
+metrics = Metrics()
@@ -1,10 +1,28 @@
-import requests
-from fpdf import FPDF
 import os
+import argparse
+import sys
 import datetime
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
+from fpdf import FPDF_VERSION
 
-from export_helper import get_connected_termination
+from data_exporters import EXPORTERS, export_to_rows
+from export_helper import CableCache, get_color_name_from_hex_direct
+from cable_paths import CablePathGraph
+from fragments import FragmentCache, get_files_hash
+from image_cache import IMAGE_WIDTH_MM, ImageCache
+from metrics import metrics
+from export_model import Site, build_device, build_rack, build_site, build_tenant
+from netbox_client import NetBoxClient
+from netbox_graphql import build_tree_query, convert_tree
+from table_renderer import Column, TableRenderer
+from streaming_pdf import STREAMING, StreamingFPDF
+from snapshot import (OBJECT_TYPES, NameIndex, get_refresh_timestamp, get_snapshot_path, group_records,
+                      load_snapshot, merge_records, new_snapshot, prune_records, save_snapshot, split_snapshot)
 
 load_dotenv()
 
@@ -20,11 +38,96 @@ headers = {
     'Accept': 'application/json',
 }
 
+# Maximale Anzahl paralleler Anfragen an NetBox
+MAX_WORKERS = int(os.getenv("NETBOX_MAX_WORKERS", 8))
+# Maximale Anzahl Geräte-IDs pro Bulk-Abfrage (hält die URL-Länge im Rahmen)
+BULK_CHUNK_SIZE = 100
+# Seitengröße für Listen-Abfragen, pro Endpoint überschreibbar (NetBox begrenzt auf MAX_PAGE_SIZE, Standard 1000)
+DEFAULT_PAGE_LIMIT = int(os.getenv("NETBOX_PAGE_LIMIT", 250))
+PAGE_LIMITS = {
+    'dcim/interfaces/': 1000,
+    'dcim/front-ports/': 1000,
+    'dcim/rear-ports/': 1000,
+    'dcim/cables/': 1000,
+}
+# Maximale Anzahl Kabel im Cache, 0 = unbegrenzt
+# Anzahl fertig abgerufener Standorte, die auf den Renderer warten dürfen
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 2))
+# Anzahl Prozesse, die im Batch-Modus Tenants parallel rendern (Standard: verfügbare CPU-Kerne)
+EXPORT_PROCESSES = int(os.getenv("EXPORT_PROCESSES", 0)) or (
+    len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count())
+# Verzeichnis für die Bilder der Gerätetypen (--images)
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "image_cache")
+# Quellcode des Renderers, ein geändertes Layout macht alle gespeicherten Fragmente (--fragment-dir) ungültig
+RENDERER_FILES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+                  for name in ('nb_export.py', 'table_renderer.py', 'streaming_pdf.py', 'export_helper.py',
+                               'image_cache.py')]
+# GraphQL-Endpoint (Standard: /graphql/ neben der API-URL)
+GRAPHQL_URL = os.getenv("NETBOX_GRAPHQL_URL") or (NETBOX_URL or '').rstrip('/').removesuffix('/api') + '/graphql/'
+# Timeouts in Sekunden, pro Endpoint überschreibbar
+DEFAULT_TIMEOUT = float(os.getenv("NETBOX_TIMEOUT", 30))
+ENDPOINT_TIMEOUTS = {
+    'dcim/interfaces/': 2 * DEFAULT_TIMEOUT,
+    'dcim/cables/': 2 * DEFAULT_TIMEOUT,
+    # Eine GraphQL-Abfrage ersetzt die Bulk-Abfragen einer ganzen Gruppe von Standorten
+    GRAPHQL_URL: 4 * DEFAULT_TIMEOUT,
+}
+# Anzahl Wiederholungen bei 429/5xx und Verbindungsfehlern
+MAX_RETRIES = int(os.getenv("NETBOX_MAX_RETRIES", 5))
+
+# Endpoints der Geräte-Komponenten und Kabel, die gesammelt über device_id abgerufen werden
+COMPONENT_ENDPOINTS = {
+    'interfaces': 'dcim/interfaces/',
+    'frontports': 'dcim/front-ports/',
+    'rearports': 'dcim/rear-ports/',
+    'cables': 'dcim/cables/',
+}
+# Komponenten-Sammlungen, die pro Gerät gruppiert werden
+DEVICE_COMPONENTS = ('interfaces', 'frontports', 'rearports')
+# Daten des Verbindungsgraphen, die vor den Standort-Gruppen für alle Geräte abgerufen werden, damit Kabelwege
+# über Patchpanels anderer Gruppen beim Bauen des Modells bereits bekannt sind
+GRAPH_ENDPOINTS = {key: COMPONENT_ENDPOINTS[key] for key in ('frontports', 'rearports', 'cables')}
+# Komponenten, die danach je Gruppe von Standorten abgerufen werden
+BATCH_ENDPOINTS = {'interfaces': COMPONENT_ENDPOINTS['interfaces']}
+# Felder, die der Bericht je Endpoint ausgibt oder der Collector zum Gruppieren braucht. NetBox ab 4.0 liefert
+# mit ?fields= nur diese Felder, ältere Versionen ignorieren den Parameter und liefern vollständige Objekte.
+ENDPOINT_FIELDS = {
+    'tenancy/tenants/': ('id', 'name', 'slug', 'description'),
+    'dcim/sites/': ('id', 'name', 'tenant', 'description', 'physical_address', 'facility', 'asns', 'time_zone',
+                    'latitude', 'longitude', 'region', 'circuit_count', 'device_count', 'prefix_count', 'rack_count',
+                    'virtualmachine_count', 'vlan_count'),
+    'dcim/racks/': ('id', 'name', 'site', 'tenant', 'facility_id', 'type', 'width', 'u_height', 'status', 'serial',
+                    'asset_tag', 'role', 'comments'),
+    'dcim/devices/': ('id', 'name', 'tenant', 'device_type', 'role', 'serial', 'asset_tag', 'site', 'location',
+                      'rack', 'position', 'face', 'custom_fields'),
+    'dcim/interfaces/': ('id', 'name', 'device', 'type', 'cable', 'untagged_vlan', 'tagged_vlans'),
+    'dcim/front-ports/': ('id', 'name', 'device', 'type', 'cable', 'rear_port', 'rear_port_position'),
+    'dcim/rear-ports/': ('id', 'name', 'device', 'type', 'cable', 'positions'),
+    'dcim/cables/': ('id', 'type', 'length', 'length_unit', 'color', 'a_terminations', 'b_terminations'),
+    'dcim/device-types/': ('id', 'model', 'u_height', 'front_image', 'rear_image'),
+}
+# Feldauswahl abschalten (NETBOX_SPARSE_FIELDS=0), z.B. zur Fehlersuche
+SPARSE_FIELDS = os.getenv("NETBOX_SPARSE_FIELDS", "1") != "0"
+# Changelog-Endpoints (NetBox >= 4.1 unter core/, ältere Versionen unter extras/)
+CHANGELOG_ENDPOINTS = ('core/object-changes/', 'extras/object-changes/')
+
+# Endpoints, deren Abfragen fehlgeschlagen sind (ein unvollständiger Snapshot wird nicht als aktuell markiert)
+fetch_errors = []
+# Endpoints, die ?fields= abgelehnt haben und danach vollständig abgerufen werden
+unsupported_fields = set()
+# Wird gesetzt, sobald eine GraphQL-Abfrage fehlschlägt; danach wird nur noch über REST abgerufen
+graphql_failed = threading.Event()
+
+client = NetBoxClient(NETBOX_URL, headers, pool_size=MAX_WORKERS, retries=MAX_RETRIES, timeout=DEFAULT_TIMEOUT,
+                      endpoint_timeouts=ENDPOINT_TIMEOUTS, metrics=metrics)
 
-class PDF(FPDF):
-    def __init__(self):
+
+class PDF(StreamingFPDF):
+    def __init__(self, section_cache=None):
         super().__init__()
         self.toc = []
+        # Fragment-Cache für Standorte, Racks und Geräte, None = alles neu zeichnen
+        self.section_cache = section_cache
 
     def header(self):
         self.set_font("Arial", 'B', 12)
@@ -36,10 +139,18 @@ class PDF(FPDF):
     def footer(self):
         self.set_y(-15)
         self.set_font("Arial", 'I', 8)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+        self.cell(0, 10, f'Page {self.page_label()}', 0, 0, 'C')
+
+    # Eintrag für die aktuelle (oder eine eingefügte) Seite: Verweis aus dem Inhaltsverzeichnis und Lesezeichen
+    def add_toc_entry(self, title, level, page=None):
+        page = page or self.page_no()
+        link = self.add_link()
+        self.set_link(link, y=0, page=page)
+        self.toc.append((title, page, level, link))
+        self.add_outline(title, level, page)
 
-    def add_toc_entry(self, title, level):
-        self.toc.append((title, self.page_no(), level))
+    def replay_outline(self, title, level, page, y):
+        self.add_toc_entry(title, level, page)
 
     def add_start_page(self):
         self.add_page()
@@ -50,22 +161,28 @@ class PDF(FPDF):
         self.cell(0, 10, f'Datum: {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}', 0, 1, 'C')
         self.ln(20)
         self.cell(0, 10, 'Generated by NetBox Export Script', 0, 1, 'C')
-        self.add_page()
+        # Das Inhaltsverzeichnis folgt auf die Startseite, wird aber erst am Ende gezeichnet
+        self.reserve_pages()
 
+    # Inhaltsverzeichnis nach dem Rendern zeichnen. Die Seiten füllen den hinter der Startseite reservierten Platz,
+    # die Seitenzahlen der Einträge stehen zu diesem Zeitpunkt fest.
     def add_toc_page(self):
+        self.begin_reserved_pages()
         self.add_page()
         self.set_font("Arial", 'B', 16)
         self.cell(0, 10, 'Inhaltsverzeichnis', 0, 1, 'C')
         self.ln(10)
         self.set_font("Arial", size=12)
-        for title, page, level in self.toc:
+        for title, page, level, link in self.toc:
             indent = "    " * level
-            self.cell(0, 10, f'{indent}{title} ...... {page}', 0, 1)
+            self.cell(0, 10, f'{indent}{title} ...... {page}', 0, 1, link=link)
 
 
 # Funktion, um die Daten eines Tenants abzurufen
 def get_tenant_data(tenant_id):
-    response = requests.get(f'{NETBOX_URL}tenancy/tenants/{tenant_id}/', headers=headers)
+    response = client.get(f'tenancy/tenants/{tenant_id}/')
+    if response is None:
+        return None
     if response.status_code == 200:
         return response.json()
     else:
@@ -73,74 +190,61 @@ def get_tenant_data(tenant_id):
         return None
 
 
-# Funktion, um die Locations eines Tenants abzurufen
-def get_tenant_locations(tenant_id):
-    response = requests.get(f'{NETBOX_URL}dcim/sites/?tenant_id={tenant_id}', headers=headers)
-    if response.status_code == 200:
-        return response.json()['results']
-    else:
-        print(
-            f'Fehler beim Abrufen der Standort-Daten: {response.status_code} [get_tenant_locations(tenant_id), {tenant_id}]')
-        return None
-
-
-# Funktion, um die Racks einer Location abzurufen
-def get_location_racks(location_id):
-    response = requests.get(f'{NETBOX_URL}dcim/racks/?site_id={location_id}', headers=headers)
-    if response.status_code == 200:
-        return response.json()['results']
-    else:
-        print(
-            f'Fehler beim Abrufen der Rack-Daten: {response.status_code} [get_location_racks(location_id), {location_id}]')
-        return None
-
-
-# Funktion, um die Devices eines Racks abzurufen
-def get_rack_devices(rack_id):
-    response = requests.get(f'{NETBOX_URL}dcim/devices/?rack_id={rack_id}', headers=headers)
-    if response.status_code == 200:
-        return response.json()['results']
-    else:
-        print(f'Fehler beim Abrufen der Geräte-Daten: {response.status_code} [get_rack_devices(rack_id), {rack_id}]')
-        return None
+# Funktion, um alle Seiten einer Listen-Abfrage abzurufen. Die Ergebnisse werden als Generator
+# geliefert, sodass immer nur eine Seite im Speicher liegt und der Aufrufer nicht auf die letzte Seite warten muss.
+def get_paginated(endpoint, params=None, limit=None):
+    url = endpoint
+    params = list(params or []) + [('limit', limit or PAGE_LIMITS.get(endpoint, DEFAULT_PAGE_LIMIT))]
+    sparse_params = get_sparse_params(endpoint, params)
+    page_params = params + sparse_params
+    while url:
+        response = client.get(url, page_params)
+        if response is None:
+            fetch_errors.append(endpoint)
+            return
+        if response.status_code == 400 and sparse_params and url == endpoint:
+            # Feldauswahl wird nicht unterstützt, vollständige Objekte abrufen
+            print(f'Feldauswahl nicht unterstützt, vollständige Objekte werden abgerufen [get_paginated(endpoint, params), {endpoint}]')
+            unsupported_fields.add(endpoint)
+            sparse_params = []
+            page_params = params
+            continue
+        if response.status_code != 200:
+            print(f'Fehler beim Abrufen der Listen-Daten: {response.status_code} [get_paginated(endpoint, params), {endpoint}]')
+            fetch_errors.append(endpoint)
+            return
+        data = response.json()
+        yield from data['results']
+        # Der next-Link enthält bereits alle Filter sowie limit und offset
+        url = data['next']
+        page_params = None
 
 
-# Funktion, um die Interfaces eines Geräts abzurufen
-def get_device_interfaces(device_id):
-    response = requests.get(f'{NETBOX_URL}dcim/interfaces/?device_id={device_id}', headers=headers)
-    if response.status_code == 200:
-        return response.json()['results']
-    else:
-        print(
-            f'Fehler beim Abrufen der Schnittstellen-Daten: {response.status_code} [get_device_interfaces(device_id), {device_id}]')
-        return None
+# Abruf unvollständig: der Export bricht ab, statt einen lückenhaften Bericht zu schreiben
+class FetchError(Exception):
+    pass
 
 
-# Funktion, um die Front Ports eines Geräts abzurufen
-def get_device_frontports(device_id):
-    response = requests.get(f'{NETBOX_URL}dcim/front-ports/?device_id={device_id}', headers=headers)
-    if response.status_code == 200:
-        return response.json()['results']
-    else:
-        print(
-            f'Fehler beim Abrufen der Schnittstellen-Daten: {response.status_code} [get_device_frontports(device_id), {device_id}]')
-        return None
+# Funktion, um einen Abruf abzubrechen, wenn seit errors_before Abfragen fehlgeschlagen sind
+def check_fetch_errors(errors_before):
+    if len(fetch_errors) > errors_before:
+        raise FetchError(f"fehlgeschlagene Abfragen: {', '.join(sorted(set(fetch_errors[errors_before:])))}")
 
 
-# Funktion, um die Rear Ports eines Geräts abzurufen
-def get_device_rearports(device_id):
-    response = requests.get(f'{NETBOX_URL}dcim/rear-ports/?device_id={device_id}', headers=headers)
-    if response.status_code == 200:
-        return response.json()['results']
-    else:
-        print(
-            f'Fehler beim Abrufen der Schnittstellen-Daten: {response.status_code} [get_device_rearports(device_id), {device_id}]')
-        return None
+# Funktion, um die Feldauswahl (?fields=) für einen Endpoint zu bestimmen. brief-Abfragen bleiben unverändert.
+def get_sparse_params(endpoint, params):
+    if not SPARSE_FIELDS or endpoint in unsupported_fields or endpoint not in ENDPOINT_FIELDS:
+        return []
+    if any(key == 'brief' for key, _ in params):
+        return []
+    return [('fields', ','.join(ENDPOINT_FIELDS[endpoint]))]
 
 
 # Funktion, um Kabelverbindungen eines Interfaces abzurufen
 def get_cable_details(cable_id):
-    response = requests.get(f'{NETBOX_URL}dcim/cables/{cable_id}/', headers=headers)
+    response = client.get(f'dcim/cables/{cable_id}/')
+    if response is None:
+        return None
     if response.status_code == 200:
         return response.json()
     else:
@@ -149,205 +253,692 @@ def get_cable_details(cable_id):
         return None
 
 
-# Funktion, um alle Geräte eines Tenants abzurufen
-def get_all_devices(tenant_id):
-    response = requests.get(f'{NETBOX_URL}dcim/devices/?tenant_id={tenant_id}', headers=headers)
-    if response.status_code == 200:
-        return response.json()['results']
-    else:
-        print(f'Fehler beim Abrufen der Geräte-Daten: {response.status_code} [get_all_devices(tenant_id), {tenant_id}]')
+# Funktion, um mehrere Listen-Abfragen parallel abzurufen. Die Ergebnisse kommen in der
+# Reihenfolge der Eingabe zurück, damit die Seitenreihenfolge im PDF stabil bleibt.
+def fetch_parallel(executor, fetcher, items):
+    return list(executor.map(lambda item: list(fetcher(item)), items))
+
+
+# Funktion, um Bulk-Abfragen für mehrere Endpoints über einen Multi-Value-Filter (z.B. device_id) aufzubauen
+def build_bulk_queries(endpoints, filter_key, ids, params=None):
+    queries = []
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), BULK_CHUNK_SIZE):
+        chunk_params = [(filter_key, object_id) for object_id in ids[start:start + BULK_CHUNK_SIZE]]
+        chunk_params.extend(params or [])
+        queries.extend((key, endpoint, chunk_params) for key, endpoint in endpoints.items())
+    return queries
+
+
+# Funktion, um Bulk-Abfragen parallel abzurufen, die Ergebnisse werden pro Schlüssel zusammengeführt
+def get_bulk_records(executor, queries):
+    records = defaultdict(list)
+    results = fetch_parallel(executor, lambda query: get_paginated(query[1], query[2]), queries)
+    for (key, _, _), result in zip(queries, results):
+        records[key].extend(result)
+    return records
+
+
+# Funktion, um nur die IDs aller Objekte einer Abfrage abzurufen (brief-Antworten)
+def get_object_ids(endpoint, params):
+    return {record['id'] for record in get_paginated(endpoint, list(params) + [('brief', 1)])}
+
+
+# Funktion, um die seit einem Zeitpunkt gelöschten Objekte aus dem NetBox-Changelog abzurufen
+def get_deleted_objects(since):
+    for endpoint in CHANGELOG_ENDPOINTS:
+        response = client.get(endpoint, [('limit', 1)])
+        if response is not None and response.status_code == 200:
+            return list(get_paginated(endpoint, [('action', 'delete'), ('time_after', since)]))
+    print(f'Fehler beim Abrufen des Changelogs [get_deleted_objects(since), {since}]')
+    fetch_errors.append('changelog')
+    return []
+
+
+# Funktion, um Tenant, Standorte und Geräte eines Tenants in den Snapshot zu laden. Ist since gesetzt, werden
+# nur die seit dem letzten Lauf geänderten Objekte (last_updated__gte) abgerufen und gelöschte entfernt.
+def fetch_tenant_objects(executor, tenant_id, snapshot, since):
+    tenant_data = get_tenant_data(tenant_id)
+    if tenant_data is None:
+        return False
+    snapshot['tenant'] = tenant_data
+
+    errors_before = len(fetch_errors)
+    delta = [('last_updated__gte', since)] if since else []
+    devices = executor.submit(list, get_paginated('dcim/devices/', [('tenant_id', tenant_id)] + delta))
+    # Standorte werden immer vollständig abgerufen: ihre Zähler (Geräte, Racks, ...) ändern sich, ohne dass
+    # last_updated des Standorts aktualisiert wird. Es sind wenige Objekte, eine Abfrage reicht meist.
+    sites = executor.submit(list, get_paginated('dcim/sites/', [('tenant_id', tenant_id)]))
+    if since:
+        device_ids = executor.submit(get_object_ids, 'dcim/devices/', [('tenant_id', tenant_id)])
+        deleted = executor.submit(get_deleted_objects, since)
+
+    sites = sites.result()
+    merge_records(snapshot, 'sites', sites)
+    merge_records(snapshot, 'devices', devices.result())
+
+    # Entfernte Objekte nur bereinigen, wenn alle Abfragen vollständig waren
+    if since and len(fetch_errors) == errors_before:
+        current_sites = {site['id'] for site in sites}
+        current_devices = device_ids.result()
+        deleted = deleted.result()
+        if len(fetch_errors) == errors_before:
+            prune_records(snapshot, 'sites', lambda site: site['id'] not in current_sites)
+            prune_records(snapshot, 'devices', lambda device: device['id'] not in current_devices)
+            for change in deleted:
+                collection = OBJECT_TYPES.get(change['changed_object_type'])
+                if collection:
+                    snapshot[collection].pop(change['changed_object_id'], None)
+    return True
+
+
+# Funktion, um Racks, Komponenten und Kabel einer Gruppe von Standorten und Geräten abzurufen.
+# Bereits im Snapshot bekannte Objekte werden inkrementell, neue vollständig abgerufen.
+# Mit graphql wird der ganze Baum vollständig per GraphQL geladen, REST bleibt der Fallback.
+def fetch_batch_objects(executor, site_ids, device_ids, since, known_sites, known_devices, graphql=False,
+                        endpoints=COMPONENT_ENDPOINTS):
+    if graphql and not graphql_failed.is_set():
+        records = get_graphql_records(executor, site_ids, device_ids,
+                                      [collection for collection in DEVICE_COMPONENTS if collection in endpoints])
+        if records is not None:
+            return records
+    delta = [('last_updated__gte', since)] if since else []
+    queries = []
+    for ids, known, endpoints, filter_key in ((site_ids, known_sites, {'racks': 'dcim/racks/'}, 'site_id'),
+                                              (device_ids, known_devices, endpoints, 'device_id')):
+        queries.extend(build_bulk_queries(endpoints, filter_key, [i for i in ids if i in known], delta))
+        queries.extend(build_bulk_queries(endpoints, filter_key, [i for i in ids if i not in known]))
+    return get_bulk_records(executor, queries)
+
+
+# Funktion, um Racks, Komponenten und Kabel per GraphQL abzurufen, mit einer Abfrage je BULK_CHUNK_SIZE Geräte
+# bzw. Standorte. Gibt None zurück, wenn eine Abfrage fehlschlägt (z.B. NetBox ohne GraphQL oder älteres Schema).
+def get_graphql_records(executor, site_ids, device_ids, collections):
+    site_ids = sorted(set(site_ids))
+    device_ids = sorted(set(device_ids))
+    chunks = [(site_ids[start:start + BULK_CHUNK_SIZE], device_ids[start:start + BULK_CHUNK_SIZE])
+              for start in range(0, max(len(site_ids), len(device_ids)), BULK_CHUNK_SIZE)]
+    records = defaultdict(list)
+    cables = {}
+    for result in executor.map(lambda chunk: get_graphql_tree(*chunk, collections), chunks):
+        if result is None:
+            graphql_failed.set()
+            return None
+        for collection, collection_records in result.items():
+            if collection == 'cables':
+                cables.update((cable['id'], cable) for cable in collection_records)
+            else:
+                records[collection].extend(collection_records)
+    records['cables'] = list(cables.values())
+    return records
+
+
+def get_graphql_tree(site_ids, device_ids, collections):
+    response = client.post(GRAPHQL_URL, {'query': build_tree_query(site_ids, device_ids, collections)})
+    if response is None:
+        return None
+    if response.status_code != 200:
+        print(f'Fehler beim Abrufen der GraphQL-Daten: {response.status_code} [get_graphql_tree(site_ids, device_ids, collections), {GRAPHQL_URL}]')
+        return None
+    data = response.json()
+    if data.get('errors'):
+        print(f"Fehler beim Abrufen der GraphQL-Daten: {data['errors'][0].get('message')} [get_graphql_tree(site_ids, device_ids, collections), {GRAPHQL_URL}]")
         return None
+    return convert_tree(data['data'])
 
 
-def get_interface_vlans(interface):
-    interface_vlans = ""
+# Funktion, um die Gerätetypen der Geräte im Snapshot abzurufen (Höhe und Bilder für --images).
+# Bereits bekannte Gerätetypen werden wie die übrigen Objekte inkrementell abgerufen.
+def fetch_device_types(executor, snapshot, since):
+    type_ids = {device['device_type']['id'] for device in snapshot['devices'].values()}
+    known = set(snapshot['device_types'])
+    delta = [('last_updated__gte', since)] if since else []
+    endpoints = {'device_types': 'dcim/device-types/'}
+    queries = build_bulk_queries(endpoints, 'id', type_ids & known, delta)
+    queries.extend(build_bulk_queries(endpoints, 'id', type_ids - known))
+    merge_records(snapshot, 'device_types', get_bulk_records(executor, queries)['device_types'])
 
-    try:
-        for vlan in interface['untagged_vlan']:
-            interface_vlans += f"{vlan['vid']}U,"
-    except (KeyError, TypeError):
-        pass
 
-    try:
-        for vlan in interface['tagged_vlans']:
-            interface_vlans += f"{vlan['vid']}T,"
-    except (KeyError, TypeError):
-        pass
+# Funktion, um die Front- und Rückansichten der Gerätetypen parallel in den Bild-Cache zu laden
+def prefetch_images(executor, images, device_types):
+    images.prefetch(executor, [device_type[key] for device_type in device_types
+                               for key in ('front_image', 'rear_image')])
 
-    return interface_vlans[:-1] if interface_vlans else interface_vlans
-
-
-# Get Color name from HEX value
-def get_color_name_from_hex_direct(hex_color):
-    switch = {
-        "aa1409": "Dark Red",
-        "f44336": "Red",
-        "e91e63": "Pink",
-        "ffe4e1": "Rose",
-        "ff66ff": "Fuchsia",
-        "9c27b0": "Purple",
-        "673ab7": "Dark Purple",
-        "3f51b5": "Indigo",
-        "2196f3": "Blue",
-        "03a9f4": "Light Blue",
-        "00bcd4": "Cyan",
-        "009688": "Teal",
-        "00ffff": "Aqua",
-        "2f6a31": "Dark Green",
-        "4caf50": "Green",
-        "8bc34a": "Light Green",
-        "cddd39": "Lime",
-        "ffeb3b": "Yellow",
-        "ffc107": "Amber",
-        "ff9800": "Orange",
-        "ff5722": "Dark Orange",
-        "795548": "Brown",
-        "c0c0c0": "Light Grey",
-        "9e9e9e": "Grey",
-        "607d8b": "Dark Grey",
-        "111111": "Black",
-        "ffffff": "White"
-    }
-
-    if hex_color:
-        #print(f"'{hex_color}' matched to '{switch.get(hex_color.lower(), 'Unknown Color')}'")
-        return switch.get(hex_color.lower(), "Unknown Color")
-    else:
-        return "N/A"
+
+# Funktion, um die Tenants für den Batch-Modus abzurufen, über feste IDs und/oder NetBox-Filter wie group_id=3
+def get_batch_tenants(tenant_ids, tenant_filters):
+    params = [('id', tenant_id) for tenant_id in tenant_ids]
+    params.extend(tuple(tenant_filter.split('=', 1)) for tenant_filter in tenant_filters)
+    return list(get_paginated('tenancy/tenants/', params))
+
+
+# Funktion, um die Daten mehrerer Tenants gemeinsam in einen Snapshot zu laden. Standorte und Geräte werden
+# über tenant_id, Racks und Komponenten über site_id bzw. device_id gesammelt für alle Tenants abgerufen.
+def fetch_shared_snapshot(tenants, graphql=False, image_dir=None):
+    snapshot = new_snapshot()
+    refreshed_at = get_refresh_timestamp()
+    errors_before = len(fetch_errors)
+    tenant_ids = [tenant['id'] for tenant in tenants]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor, metrics.stage('fetch'):
+        queries = build_bulk_queries({'sites': 'dcim/sites/', 'devices': 'dcim/devices/'}, 'tenant_id', tenant_ids)
+        records = get_bulk_records(executor, queries)
+        merge_records(snapshot, 'sites', records['sites'])
+        merge_records(snapshot, 'devices', records['devices'])
+
+        records = fetch_batch_objects(executor, list(snapshot['sites']), list(snapshot['devices']), None, set(), set(),
+                                      graphql)
+        for collection in ('racks', 'cables') + DEVICE_COMPONENTS:
+            merge_records(snapshot, collection, records[collection])
+        # Die Render-Prozesse lesen die Bilder nur noch aus dem Cache
+        if image_dir:
+            fetch_device_types(executor, snapshot, None)
+            images = ImageCache(client, image_dir)
+            prefetch_images(executor, images, snapshot['device_types'].values())
+            metrics.record_cache('images', images.stats())
+    check_fetch_errors(errors_before)
+    snapshot['fetched_at'] = refreshed_at
+    return snapshot
+
+
+# Funktion, um die Geräte eines Standorts nach Rack zu gruppieren. Geräte, deren Rack nicht
+# zu den Racks des Standorts gehört, werden wie Geräte ohne Rack geführt.
+def group_devices(devices, rack_ids):
+    rack_devices = defaultdict(list)
+    unracked_devices = []
+    for device in devices:
+        if device['rack'] and device['rack']['id'] in rack_ids:
+            rack_devices[device['rack']['id']].append(device)
+        else:
+            unracked_devices.append(device)
+    return rack_devices, unracked_devices
+
+
+# Funktion, um Standorte in Gruppen aufzuteilen, deren Geräte zusammen etwa eine Bulk-Abfrage füllen
+def batch_sites(sites, devices_by_site):
+    batch = []
+    device_count = 0
+    for site in sites:
+        batch.append(site)
+        device_count += len(devices_by_site.get(site['id'], ()))
+        if device_count >= BULK_CHUNK_SIZE:
+            yield batch
+            batch = []
+            device_count = 0
+    if batch:
+        yield batch
+
+
+# Collector: ruft die Daten eines Tenants in Gruppen von Standorten ab und legt das Export-Modell in die Queue,
+# zuerst den Tenant, dann jeden Standort und zuletzt Geräte an Standorten anderer Tenants. Während der Renderer
+# einen Standort zeichnet, werden bereits die nächsten abgerufen. Im Offline-Modus wird nur der Snapshot gelesen.
+def collect_tenant(output_queue, tenant_id, snapshot=None, offline=False, keep_snapshot=True, graphql=False,
+                   image_dir=None):
+    refreshed_at = get_refresh_timestamp()
+    errors_before = len(fetch_errors)
+    since = snapshot['fetched_at'] if snapshot else None
+    if snapshot is None:
+        snapshot = new_snapshot()
+    known_sites = set(snapshot['sites'])
+    known_devices = set(snapshot['devices'])
+
+    # Im Offline-Modus werden fehlende Kabel nicht nachgeladen
+    cable_cache = CableCache((lambda cable_id: None) if offline else get_cable_details)
+    cable_cache.preload(snapshot['cables'].values())
+    images = ImageCache(client, image_dir, offline) if image_dir else None
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        if not offline:
+            with metrics.stage('fetch'):
+                if not fetch_tenant_objects(executor, tenant_id, snapshot, since):
+                    return None
+            check_fetch_errors(errors_before)
+        output_queue.put(build_tenant(snapshot['tenant']))
+        if images is not None:
+            with metrics.stage('fetch'):
+                if not offline:
+                    fetch_device_types(executor, snapshot, since)
+                    check_fetch_errors(errors_before)
+                prefetch_images(executor, images, snapshot['device_types'].values())
+        device_types = snapshot['device_types']
+
+        devices_by_site = group_records(snapshot['devices'].values(), lambda device: device['site']['id'])
+        racks_by_site = group_records(snapshot['racks'].values(), lambda rack: rack['site']['id'])
+        components = {collection: group_records(snapshot[collection].values(), lambda component: component['device']['id'])
+                      for collection in DEVICE_COMPONENTS}
+        cables = {}
+        names = NameIndex(snapshot)
+
+        if not offline:
+            with metrics.stage('fetch'):
+                records = fetch_batch_objects(executor, [], list(snapshot['devices']), since, known_sites,
+                                              known_devices, graphql, GRAPH_ENDPOINTS)
+            check_fetch_errors(errors_before)
+            merge_batch_records(snapshot, records, racks_by_site, components, cable_cache)
+        with metrics.stage('build'):
+            graph = build_cable_graph(snapshot)
+
+        # Die letzte Gruppe enthält keine Standorte, sondern die Geräte an Standorten anderer Tenants
+        other_devices = [device for device in snapshot['devices'].values() if device['site']['id'] not in snapshot['sites']]
+        for batch in list(batch_sites(snapshot['sites'].values(), devices_by_site)) + [[]]:
+            if batch:
+                devices = [device for site in batch for device in devices_by_site.get(site['id'], {}).values()]
+            else:
+                devices = other_devices
+            if not offline:
+                # Standorte einer Gruppe werden gemeinsam abgerufen, gemessen wird deshalb je Gruppe
+                batch_name = f"{batch[0]['name']} (+{len(batch) - 1})" if batch else 'other sites'
+                with metrics.stage('fetch'), metrics.section('fetch', 'batch', batch_name):
+                    records = fetch_batch_objects(executor, [site['id'] for site in batch],
+                                                  [device['id'] for device in devices], since, known_sites,
+                                                  known_devices, graphql, BATCH_ENDPOINTS)
+                check_fetch_errors(errors_before)
+                merge_batch_records(snapshot, records, racks_by_site, components, cable_cache)
+
+            for site in batch:
+                with metrics.stage('build'), metrics.section('build', 'site', site['name']):
+                    site_racks = list(racks_by_site.get(site['id'], {}).values())
+                    rack_devices, unracked_devices = group_devices(devices_by_site.get(site['id'], {}).values(),
+                                                                   {rack['id'] for rack in site_racks})
+                    racks = [build_rack(rack, [build_device(device, components, cable_cache, cables, names, graph,
+                                                            device_types, images)
+                                               for device in rack_devices.get(rack['id'], [])])
+                             for rack in site_racks]
+                    site_model = build_site(site, racks, [build_device(device, components, cable_cache, cables,
+                                                                       names, graph, device_types, images)
+                                                          for device in unracked_devices])
+                output_queue.put(site_model)
+            if not batch:
+                for device in devices:
+                    with metrics.stage('build'):
+                        device_model = build_device(device, components, cable_cache, cables, names, graph,
+                                                    device_types, images)
+                    output_queue.put(device_model)
+
+            # Ohne Snapshot-Datei werden die Rohdaten nach dem Bauen des Modells freigegeben
+            if not keep_snapshot:
+                for device in devices:
+                    for collection in DEVICE_COMPONENTS:
+                        for component_id in components[collection].pop(device['id'], {}):
+                            snapshot[collection].pop(component_id, None)
+
+    prune_records(snapshot, 'racks', lambda rack: rack['site']['id'] not in snapshot['sites'])
+    for collection in DEVICE_COMPONENTS:
+        prune_records(snapshot, collection, lambda component: component['device']['id'] not in snapshot['devices'])
+    type_ids = {device['device_type']['id'] for device in snapshot['devices'].values()}
+    prune_records(snapshot, 'device_types', lambda device_type: device_type['id'] not in type_ids)
+    # Fehlgeschlagene Abfragen brechen den Lauf vorher ab, der Snapshot ist hier vollständig
+    if not offline:
+        snapshot['fetched_at'] = refreshed_at
+
+    cable_stats = cable_cache.stats()
+    print(f"Kabel-Cache: {cable_stats['hits']} Treffer, {cable_stats['misses']} Fehlschläge")
+    metrics.record_cache('cables', cable_stats)
+    if images is not None:
+        metrics.record_cache('images', images.stats())
+    return snapshot
+
+
+# Funktion, um abgerufene Racks, Komponenten und Kabel in den Snapshot und die Gruppierungen zu übernehmen
+def merge_batch_records(snapshot, records, racks_by_site, components, cable_cache):
+    merge_records(snapshot, 'racks', records['racks'])
+    group_records(records['racks'], lambda rack: rack['site']['id'], racks_by_site)
+    for collection in DEVICE_COMPONENTS:
+        merge_records(snapshot, collection, records[collection])
+        group_records(records[collection], lambda component: component['device']['id'], components[collection])
+    merge_records(snapshot, 'cables', records['cables'])
+    cable_cache.preload(records['cables'])
+
+
+# Funktion, um den Verbindungsgraphen aus den Kabeln, Front- und Rear-Ports des Snapshots aufzubauen
+def build_cable_graph(snapshot):
+    graph = CablePathGraph()
+    for cable in snapshot['cables'].values():
+        graph.add_cable(cable)
+    for port in snapshot['frontports'].values():
+        graph.add_front_port(port)
+    for port in snapshot['rearports'].values():
+        graph.add_rear_port(port)
+    return graph
+
+
+# Fehlermarke in der Queue: der Collector ist abgebrochen, der Renderer verwirft die begonnene Ausgabe
+class CollectorFailed(Exception):
+    pass
+
+
+# Renderer abgebrochen, der Collector beendet sich beim nächsten put()
+class PipelineCancelled(Exception):
+    pass
+
+
+# Queue zwischen Collector und Renderer. Bricht der Renderer ab, gibt cancel() einen wartenden Collector frei,
+# damit er nicht an der vollen Queue hängen bleibt und seinen Snapshot im Speicher hält.
+class PipelineQueue(queue.Queue):
+    def __init__(self, maxsize=0):
+        super().__init__(maxsize)
+        self.cancelled = threading.Event()
+
+    def put(self, item, block=True, timeout=None):
+        if self.cancelled.is_set():
+            raise PipelineCancelled()
+        super().put(item, block, timeout)
+
+    # Letztes Element (Ende oder Fehlermarke) einreihen, nach cancel() wird es nicht mehr gelesen
+    def finish(self, item):
+        try:
+            self.put(item)
+        except PipelineCancelled:
+            pass
+
+    def cancel(self):
+        self.cancelled.set()
+        while True:
+            try:
+                self.get_nowait()
+            except queue.Empty:
+                break
+
+
+# Funktion, um den Collector in einem eigenen Thread zu starten. Die Queue ist begrenzt, damit der Collector
+# höchstens PIPELINE_QUEUE_SIZE Standorte vor dem Renderer liegt und der Speicherbedarf flach bleibt.
+def start_collector(*args, **kwargs):
+    output_queue = PipelineQueue(maxsize=PIPELINE_QUEUE_SIZE)
+    result = {}
+
+    def run():
+        try:
+            with metrics.profile():
+                result['snapshot'] = collect_tenant(output_queue, *args, **kwargs)
+            # None markiert das Ende der Queue
+            output_queue.finish(None)
+        except PipelineCancelled:
+            pass
+        except Exception as error:
+            result['error'] = error
+            output_queue.finish(CollectorFailed())
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return output_queue, thread, result
+
+
+def iter_queue(input_queue):
+    while (item := input_queue.get()) is not None:
+        if isinstance(item, CollectorFailed):
+            raise item
+        yield item
+
+
+# Length column of a port table
+def get_cable_length(port):
+    if not port.cable:
+        return 'N/A'
+    length = port.cable.length if port.cable.length else 'N/A'
+    length_unit = port.cable.length_unit if port.cable.length_unit else 'N/A'
+    return str(length) + ' ' + str(length_unit)
+
+
+# Front- und Rear-Ports von Patchpanels
+PATCHPANEL_PORT_TABLE = TableRenderer([
+    Column("Name", 30, lambda port: port.name),
+    Column("Type", 40, lambda port: port.type),
+    Column("Connected To", 50, lambda port: port.connected_to if port.cable else "N/A"),
+    Column("Cable Type", 35, lambda port: port.cable.type if port.cable else "N/A"),
+    Column("Length", 15, get_cable_length),
+    Column("Color", 20, lambda port: get_color_name_from_hex_direct(port.cable.color) if port.cable else "N/A"),
+], header_height=10)
+
+INTERFACE_TABLE = TableRenderer([
+    Column("Name", 30, lambda port: port.name),
+    Column("Type", 40, lambda port: port.type),
+    Column("Possible VLANs", 50, lambda port: port.vlans if port.cable else "N/A"),
+    Column("IP Addresses", 50, lambda port: ", ".join(port.ip_addresses) if port.cable else "N/A"),
+    Column("Connected To", 50, lambda port: port.connected_to if port.cable else "N/A"),
+    Column("Cable Type", 25, lambda port: port.cable.type if port.cable else "N/A"),
+    Column("Length", 15, get_cable_length),
+    Column("Color", 20, lambda port: get_color_name_from_hex_direct(port.cable.color) if port.cable else "N/A"),
+])
+
+
+# Rack elevation: maximum height of one rack unit and width of a view (mm)
+RACK_UNIT_HEIGHT = 5
+ELEVATION_WIDTH = 70
 
 
 # Export device interfaces to PDF
 def export_device_interfaces(pdf, device):
-    frontports = get_device_frontports(device['id'])
-    rearports = get_device_rearports(device['id'])
-    if device['role']['name'] == "Patchpanel":
+    if device.role == "Patchpanel":
+        for title, ports in (("Front-Ports:", device.frontports), ("Rear-Ports:", device.rearports)):
+            pdf.add_page(orientation="L")
+            pdf.cell(200, 10, txt=title, ln=True)
+            PATCHPANEL_PORT_TABLE.render(pdf, ports)
+            pdf.ln(2.5)
+
+    if device.interfaces:
         pdf.add_page(orientation="L")
-        pdf.cell(200, 10, txt="Front-Ports:", ln=True)
-        pdf.set_font("Arial", size=10)
-        pdf.cell(30, 10, txt="Name", border=1)
-        pdf.cell(40, 10, txt="Type", border=1)
-        pdf.cell(50, 10, txt="Connected To", border=1)
-        pdf.cell(35, 10, txt="Cable Type", border=1)
-        pdf.cell(15, 10, txt="Length", border=1)
-        pdf.cell(20, 10, txt="Color", border=1)
-        pdf.ln(10)
-        for interface in frontports:
-            pdf.cell(30, 5, txt=interface['name'], border=1)
-            pdf.cell(40, 5, txt=interface['type']['label'], border=1)
-            if interface['cable']:
-                cable = get_cable_details(interface['cable']['id'])
-                termination = get_connected_termination(device['id'], cable)
-                if termination:
-                    connected_to = (termination['object']['device']['name'])
-                    pdf.cell(50, 5, txt=connected_to, border=1)
-                    pdf.cell(35, 5, txt=cable['type'], border=1)
-                    length = cable['length'] if cable['length'] else 'N/A'
-                    length_unit = cable['length_unit']['value'] if cable['length_unit'] else 'N/A'
-                    pdf.cell(15, 5, txt=str(length) + ' ' + str(length_unit), border=1)
-                    pdf.cell(20, 5, txt=get_color_name_from_hex_direct(cable['color']), border=1)
-                else:
-                    pdf.cell(50, 5, txt="N/A", border=1)
-                    pdf.cell(35, 5, txt="N/A", border=1)
-                    pdf.cell(15, 5, txt="N/A", border=1)
-                    pdf.cell(20, 5, txt="N/A", border=1)
-            else:
-                pdf.cell(50, 5, txt="N/A", border=1)
-                pdf.cell(35, 5, txt="N/A", border=1)
-                pdf.cell(15, 5, txt="N/A", border=1)
-                pdf.cell(20, 5, txt="N/A", border=1)
-            pdf.ln(5)
+        pdf.cell(200, 5, txt="Interfaces:", ln=True)
+        INTERFACE_TABLE.render(pdf, device.interfaces)
         pdf.ln(2.5)
 
-        pdf.add_page(orientation="L")
-        pdf.cell(200, 10, txt="Rear-Ports:", ln=True)
-        pdf.set_font("Arial", size=10)
-        pdf.cell(30, 10, txt="Name", border=1)
-        pdf.cell(40, 10, txt="Type", border=1)
-        pdf.cell(50, 10, txt="Connected To", border=1)
-        pdf.cell(35, 10, txt="Cable Type", border=1)
-        pdf.cell(15, 10, txt="Length", border=1)
-        pdf.cell(20, 10, txt="Color", border=1)
-        pdf.ln(10)
-        for interface in rearports:
-            pdf.cell(30, 5, txt=interface['name'], border=1)
-            pdf.cell(40, 5, txt=interface['type']['label'], border=1)
-            if interface['cable']:
-                cable = get_cable_details(interface['cable']['id'])
-                termination = get_connected_termination(device['id'], cable)
-                if termination:
-                    connected_to = (termination['object']['device']['name'])
-                    pdf.cell(50, 5, txt=connected_to, border=1)
-                    pdf.cell(35, 5, txt=cable['type'], border=1)
-                    length = cable['length'] if cable['length'] else 'N/A'
-                    length_unit = cable['length_unit']['value'] if cable['length_unit'] else 'N/A'
-                    pdf.cell(15, 5, txt=str(length) + ' ' + str(length_unit), border=1)
-                    pdf.cell(20, 5, txt=get_color_name_from_hex_direct(cable['color']), border=1)
-                else:
-                    pdf.cell(50, 5, txt="N/A", border=1)
-                    pdf.cell(35, 5, txt="N/A", border=1)
-                    pdf.cell(15, 5, txt="N/A", border=1)
-                    pdf.cell(20, 5, txt="N/A", border=1)
-            else:
-                pdf.cell(50, 5, txt="N/A", border=1)
-                pdf.cell(35, 5, txt="N/A", border=1)
-                pdf.cell(15, 5, txt="N/A", border=1)
-                pdf.cell(20, 5, txt="N/A", border=1)
+
+# Front and rear image of the device type
+def export_device_images(pdf, device):
+    for title, image in (("Front Image:", device.front_image), ("Rear Image:", device.rear_image)):
+        if image:
+            pdf.cell(200, 10, txt=title, ln=True)
+            pdf.image(image, x=pdf.l_margin, w=IMAGE_WIDTH_MM)
             pdf.ln(5)
-        pdf.ln(2.5)
 
-    interfaces = get_device_interfaces(device['id'])
-    if interfaces:
-        pdf.add_page(orientation="L")
-        pdf.cell(200, 5, txt="Interfaces:", ln=True)
-        pdf.set_font("Arial", size=10)
-        pdf.cell(30, 5, txt="Name", border=1)
-        pdf.cell(40, 5, txt="Type", border=1)
-        pdf.cell(50, 5, txt="Possible VLANs", border=1)
-        pdf.cell(50, 5, txt="IP Addresses", border=1)
-        pdf.cell(50, 5, txt="Connected To", border=1)
-        pdf.cell(25, 5, txt="Cable Type", border=1)
-        pdf.cell(15, 5, txt="Length", border=1)
-        pdf.cell(20, 5, txt="Color", border=1)
+
+# Export a racked device to PDF
+def export_device(pdf, device):
+    # Add Devices
+    pdf.add_page()
+    # Add Toc
+    pdf.add_toc_entry(device.name, level=3)
+    pdf.set_font("Arial", size=14)
+    pdf.cell(200, 10, txt=f"Device Name: {device.name}", ln=True, align='C')
+    pdf.ln(10)
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"Device Type: {device.device_type}", ln=True)
+    pdf.cell(200, 10, txt=f"Device Role: {device.role}", ln=True)
+    pdf.cell(200, 10, txt=f"Serial Number: {device.serial if device.serial else 'N/A'}", ln=True)
+    pdf.cell(200, 10, txt=f"Asset Tag: {device.asset_tag if device.asset_tag else 'N/A'}", ln=True)
+    pdf.cell(200, 10, txt=f"Site: {device.site}", ln=True)
+    pdf.cell(200, 10, txt=f"Location: {device.location if device.location else 'N/A'}", ln=True)
+    pdf.ln(5)
+    export_device_images(pdf, device)
+
+    # Add Interfaces
+    export_device_interfaces(pdf, device)
+
+    # Add Custom Fields if available
+    if device.custom_fields is not None:
+        pdf.cell(200, 10, txt="Custom Fields:", ln=True)
+        for field, value in device.custom_fields.items():
+            pdf.cell(200, 10, txt=f" - {field}: {value}", ln=True)
         pdf.ln(5)
-        for interface in interfaces:
-            pdf.cell(30, 5, txt=interface['name'], border=1)
-            pdf.cell(40, 5, txt=interface['type']['label'], border=1)
-            if interface['cable']:
-                cable = get_cable_details(interface['cable']['id'])
-                termination = get_connected_termination(device['id'], cable)
-                if termination:
-                    vlans = get_interface_vlans(interface)
-                    pdf.cell(50, 5, txt=vlans, border=1)
-                    pdf.cell(50, 5, txt=", ".join([ip['address'] for ip in interface.get('ip_addresses', [])]),
-                             border=1)
-                    connected_to = (termination['object']['device']['name'])
-                    pdf.cell(50, 5, txt=connected_to, border=1)
-                    pdf.cell(25, 5, txt=cable['type'], border=1)
-                    length = cable['length'] if cable['length'] else 'N/A'
-                    length_unit = cable['length_unit']['value'] if cable['length_unit'] else 'N/A'
-                    pdf.cell(15, 5, txt=str(length) + ' ' + str(length_unit), border=1)
-                    pdf.cell(20, 5, txt=get_color_name_from_hex_direct(cable['color']), border=1)
-                else:
-                    pdf.cell(50, 5, txt="N/A", border=1)
-                    pdf.cell(50, 5, txt="N/A", border=1)
-                    pdf.cell(50, 5, txt="N/A", border=1)
-                    pdf.cell(25, 5, txt="N/A", border=1)
-                    pdf.cell(15, 5, txt="N/A", border=1)
-                    pdf.cell(20, 5, txt="N/A", border=1)
-            else:
-                pdf.cell(50, 5, txt="N/A", border=1)
-                pdf.cell(50, 5, txt="N/A", border=1)
-                pdf.cell(50, 5, txt="N/A", border=1)
-                pdf.cell(25, 5, txt="N/A", border=1)
-                pdf.cell(15, 5, txt="N/A", border=1)
-                pdf.cell(20, 5, txt="N/A", border=1)
-            pdf.ln(5)
-        pdf.ln(2.5)
 
+    # Add Rack Position if available
+    if device.rack:
+        pdf.cell(200, 10, txt=f"Rack: {device.rack}", ln=True)
+        pdf.cell(200, 10, txt=f"Rack Position: {device.position}", ln=True)
+        pdf.cell(200, 10, txt=f"Face: {device.face if device.face else 'N/A'}", ln=True)
+        pdf.ln(5)
+
+
+# Export a device without rack to PDF
+def export_unracked_device(pdf, device):
+    # Add Devices
+    pdf.add_page()
+    # Add Toc
+    pdf.add_toc_entry(device.name, level=3)
+    pdf.set_font("Arial", size=14)
+    pdf.cell(200, 10, txt=f"Device Name: {device.name}", ln=True, align='C')
+    pdf.ln(10)
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"Device Type: {device.device_type}", ln=True)
+    pdf.cell(200, 10, txt=f"Device Role: {device.role}", ln=True)
+    pdf.cell(200, 10, txt=f"Serial Number: {device.serial if device.serial else 'N/A'}", ln=True)
+    pdf.cell(200, 10, txt=f"Site: {device.site}", ln=True)
+    pdf.ln(5)
+    export_device_images(pdf, device)
+
+    # Add Interfaces
+    export_device_interfaces(pdf, device)
+
+
+# Rack elevation: front and rear view with the device type images at the device positions.
+# Every device type image is embedded once, no matter how many devices use it.
+def export_rack_elevation(pdf, rack):
+    if not any(device.front_image or device.rear_image for device in rack.devices):
+        return
+    pdf.add_page()
+    pdf.set_font("Arial", size=14)
+    pdf.cell(200, 10, txt=f"Rack Elevation: {rack.name}", ln=True, align='C')
+    top = pdf.get_y() + 10
+    unit = min(RACK_UNIT_HEIGHT, (pdf.h - 20 - top) / rack.u_height)
+    pdf.set_font("Arial", size=6)
+    for face, x in (("Front", 25), ("Rear", 115)):
+        pdf.set_xy(x, top - 6)
+        pdf.cell(ELEVATION_WIDTH, 5, txt=face, align='C')
+        pdf.rect(x, top, ELEVATION_WIDTH, rack.u_height * unit)
+        for number in range(1, int(rack.u_height) + 1):
+            pdf.set_xy(x - 8, top + (rack.u_height - number) * unit)
+            pdf.cell(7, unit, txt=str(number), align='R')
+
+        for device in rack.devices:
+            u_height = device.u_height if device.u_height is not None else 1
+            if not device.position or not u_height:
+                continue
+            y = top + (rack.u_height - device.position - u_height + 1) * unit
+            # A device mounted on the rear shows its rear side in the front view
+            image = device.front_image if (device.face or "Front") == face else device.rear_image
+            if image:
+                pdf.image(image, x, y, ELEVATION_WIDTH, u_height * unit)
+            pdf.rect(x, y, ELEVATION_WIDTH, u_height * unit)
+            if not image:
+                pdf.set_xy(x, y)
+                pdf.cell(ELEVATION_WIDTH, u_height * unit, txt=device.name, align='C')
+
+
+# Export a rack and its devices to PDF
+def export_rack(pdf, rack):
+    # Add Rack Information
+    pdf.add_page()
+    # Add Toc
+    pdf.add_toc_entry(rack.name, level=1)
+    pdf.set_font("Arial", size=14)
+    pdf.cell(200, 10, txt=f"Rack: {rack.name}", ln=True, align='C')
+    pdf.ln(10)
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"Facility ID: {rack.facility_id}", ln=True)
+    pdf.cell(200, 10, txt=f"Type: {rack.type if rack.type else 'N/A'}", ln=True)
+    pdf.cell(200, 10, txt=f"Width: {rack.width}", ln=True)
+    pdf.cell(200, 10, txt=f"Height: {rack.u_height} U", ln=True)
+    pdf.cell(200, 10, txt=f"Status: {rack.status}", ln=True)
+    pdf.cell(200, 10, txt=f"Serial Number: {rack.serial if rack.serial else 'N/A'}", ln=True)
+    pdf.cell(200, 10, txt=f"Asset Tag: {rack.asset_tag}", ln=True)
+    pdf.cell(200, 10, txt=f"Role: {rack.role if rack.role else 'N/A'}", ln=True)
+    pdf.cell(200, 10, txt=f"Comments: {rack.comments if rack.comments else 'N/A'}", ln=True)
+    pdf.ln(10)
+    export_rack_elevation(pdf, rack)
+
+    for device in rack.devices:
+        with metrics.section('render', 'device', device.name):
+            render_section(pdf, export_device, device)
+
+
+# Export a location with its racks and devices without rack to PDF
+def export_location(pdf, location):
+    # Add Locations
+    pdf.add_page()
+    # Set Toc
+    pdf.add_toc_entry(location.name, level=0)
+    pdf.set_font("Arial", size=14)
+    pdf.cell(200, 10, txt=f"Location: {location.name}", ln=True, align='C')
+    pdf.ln(10)
+    pdf.cell(200, 10, txt=f"Description: {location.description if location.description else 'N/A'}", ln=True)
+    pdf.cell(200, 10,
+             txt=f"Physical Address: {location.physical_address if location.physical_address else 'N/A'}",
+             ln=True)
+    pdf.cell(200, 10, txt=f"Facility: {location.facility if location.facility else 'N/A'}", ln=True)
+    pdf.cell(200, 10, txt=f"ASN: {location.asns if location.asns else 'N/A'}", ln=True)
+    pdf.cell(200, 10, txt=f"Timezone: {location.time_zone if location.time_zone else 'N/A'}", ln=True)
+    pdf.cell(200, 10, txt=f"Latitude: {location.latitude if location.latitude else 'N/A'}", ln=True)
+    pdf.cell(200, 10, txt=f"Longitude: {location.longitude if location.longitude else 'N/A'}", ln=True)
+    pdf.cell(200, 10, txt=f"Region: {location.region if location.region else 'N/A'}", ln=True)
+    pdf.ln(5)
+
+    pdf.set_font("Arial", size=10)
+    pdf.cell(30, 5, txt=f"Circuits: {location.circuit_count}", border=1)
+    pdf.cell(30, 5, txt=f"Devices: {location.device_count}", border=1)
+    pdf.cell(30, 5, txt=f"Prefixes: {location.prefix_count}", border=1)
+    pdf.cell(30, 5, txt=f"Racks: {location.rack_count}", border=1)
+    pdf.cell(30, 5, txt=f"VMs: {location.virtualmachine_count}", border=1)
+    pdf.cell(30, 5, txt=f"VLANs: {location.vlan_count}", border=1)
+
+    pdf.ln(5)
+
+    for rack in location.racks:
+        with metrics.section('render', 'rack', rack.name):
+            render_section(pdf, export_rack, rack)
+
+    # Add Devices without Rack
+    for device in location.devices:
+        with metrics.section('render', 'device', device.name):
+            render_section(pdf, export_unracked_device, device)
+
+
+# Funktion, um einen Abschnitt (Standort, Rack oder Gerät) zu zeichnen. Mit Fragment-Cache werden unveränderte
+# Abschnitte als fertige Seiten eingefügt, geänderte werden neu gezeichnet und für den nächsten Lauf gespeichert.
+def render_section(pdf, render, model):
+    cache = pdf.section_cache
+    if cache is None:
+        render(pdf, model)
+        return
+    key = cache.get_key(render.__name__, model)
+    fragment = cache.load(key)
+    if fragment is not None and pdf.replay_fragment(key, fragment, cache.read):
+        return
+    cache.begin()
+    pdf.begin_fragment(key)
+    render(pdf, model)
+    cache.end(key, pdf.end_fragment())
+
+
+# Export as PDF. items liefert zuerst den Tenant, dann Standorte und zuletzt Geräte an Standorten anderer Tenants.
+# Mit fragment_dir werden nur Abschnitte neu gezeichnet, deren Daten sich seit dem letzten Lauf geändert haben.
+def export_to_pdf(items, fragment_dir=None):
+    items = iter(items)
+    tenant = next(items, None)
+    if tenant is None:
+        return
 
-# Export as PDF
-def export_to_pdf(tenant_data, locations):
-    pdf = PDF()
+    section_cache = None
+    if fragment_dir and STREAMING:
+        section_cache = FragmentCache(os.path.join(fragment_dir, f'tenant_{tenant.id}'),
+                                      get_files_hash(RENDERER_FILES) + FPDF_VERSION)
+    # Fertige Seiten werden laufend in eine temporäre Datei geschrieben, der Speicherbedarf bleibt flach
+    pdf = PDF(section_cache)
+    try:
+        render_pdf(pdf, tenant, items)
+    except BaseException:
+        pdf.discard()
+        raise
+
+    # Save PDF with Tenant Name and Timestamp
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    pdf_filename = f"{tenant.name}_{timestamp}.pdf"
+    pdf.output(pdf_filename)
+    print(f"PDF wurde erfolgreich als '{pdf_filename}' erstellt.")
+    if section_cache is not None:
+        section_cache.prune()
+        metrics.record_cache('fragments', section_cache.stats())
+
+
+# Funktion, um den Bericht in ein PDF zu zeichnen und das Dokument abzuschließen
+def render_pdf(pdf, tenant, items):
     pdf.add_start_page()
     pdf.set_auto_page_break(auto=True, margin=15)
 
@@ -357,138 +948,205 @@ def export_to_pdf(tenant_data, locations):
     pdf.cell(200, 10, txt="Tenant Information", ln=True, align='C')
     pdf.ln(10)
     pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"Name: {tenant_data['name']}", ln=True)
-    pdf.cell(200, 10, txt=f"Slug: {tenant_data['slug']}", ln=True)
-    pdf.cell(200, 10, txt=f"Description: {tenant_data['description']}", ln=True)
+    pdf.cell(200, 10, txt=f"Name: {tenant.name}", ln=True)
+    pdf.cell(200, 10, txt=f"Slug: {tenant.slug}", ln=True)
+    pdf.cell(200, 10, txt=f"Description: {tenant.description}", ln=True)
     pdf.ln(10)
 
-    devices_processed = set()
-
-    for location in locations:
-        # Set Toc
-        pdf.add_toc_entry(location['name'], level=0)
-        # Add Locations
-        pdf.add_page()
-        pdf.set_font("Arial", size=14)
-        pdf.cell(200, 10, txt=f"Location: {location['name']}", ln=True, align='C')
-        pdf.ln(10)
-        pdf.cell(200, 10, txt=f"Description: {location['description'] if location['description'] else 'N/A'}", ln=True)
-        pdf.cell(200, 10,
-                 txt=f"Physical Address: {location['physical_address'] if location['physical_address'] else 'N/A'}",
-                 ln=True)
-        pdf.cell(200, 10, txt=f"Facility: {location['facility'] if location['facility'] else 'N/A'}", ln=True)
-        pdf.cell(200, 10, txt=f"ASN: {location['asns'] if location['asns'] else 'N/A'}", ln=True)
-        pdf.cell(200, 10, txt=f"Timezone: {location['time_zone'] if location['time_zone'] else 'N/A'}", ln=True)
-        pdf.cell(200, 10, txt=f"Latitude: {location['latitude'] if location['latitude'] else 'N/A'}", ln=True)
-        pdf.cell(200, 10, txt=f"Longitude: {location['longitude'] if location['longitude'] else 'N/A'}", ln=True)
-        pdf.cell(200, 10, txt=f"Region: {location['region']['name'] if location['region'] else 'N/A'}", ln=True)
-        pdf.ln(5)
+    for item in items:
+        if isinstance(item, Site):
+            with metrics.stage('render'), metrics.section('render', 'site', item.name):
+                render_section(pdf, export_location, item)
+        else:
+            # Add Devices of other Sites (e.g. Sites that belong to another Tenant)
+            with metrics.stage('render'), metrics.section('render', 'device', item.name):
+                render_section(pdf, export_unracked_device, item)
 
-        pdf.set_font("Arial", size=10)
-        pdf.cell(30, 5, txt=f"Circuits: {location['circuit_count']}", border=1)
-        pdf.cell(30, 5, txt=f"Devices: {location['device_count']}", border=1)
-        pdf.cell(30, 5, txt=f"Prefixes: {location['prefix_count']}", border=1)
-        pdf.cell(30, 5, txt=f"Racks: {location['rack_count']}", border=1)
-        pdf.cell(30, 5, txt=f"VMs: {location['virtualmachine_count']}", border=1)
-        pdf.cell(30, 5, txt=f"VLANs: {location['vlan_count']}", border=1)
+    # Add Table of Contents
+    with metrics.stage('render'):
+        pdf.add_toc_page()
+        pdf.close()
 
-        pdf.ln(5)
 
-        all_devices = get_all_devices(tenant_data['id'])
-
-        racks = get_location_racks(location['id'])
-        for rack in racks:
-            # Add Toc
-            pdf.add_toc_entry(rack['name'], level=1)
-            # Add Rack Information
-            pdf.add_page()
-            pdf.set_font("Arial", size=14)
-            pdf.cell(200, 10, txt=f"Rack: {rack['name']}", ln=True, align='C')
-            pdf.ln(10)
-            pdf.set_font("Arial", size=12)
-            pdf.cell(200, 10, txt=f"Facility ID: {rack['facility_id']}", ln=True)
-            pdf.cell(200, 10, txt=f"Type: {rack['type']['label'] if rack['type'] else 'N/A'}", ln=True)
-            pdf.cell(200, 10, txt=f"Width: {rack['width']}", ln=True)
-            pdf.cell(200, 10, txt=f"Height: {rack['u_height']} U", ln=True)
-            pdf.cell(200, 10, txt=f"Status: {rack['status']['label']}", ln=True)
-            pdf.cell(200, 10, txt=f"Serial Number: {rack['serial'] if rack['serial'] else 'N/A'}", ln=True)
-            pdf.cell(200, 10, txt=f"Asset Tag: {rack['asset_tag']}", ln=True)
-            pdf.cell(200, 10, txt=f"Role: {rack['role']['name'] if rack['role'] else 'N/A'}", ln=True)
-            pdf.cell(200, 10, txt=f"Comments: {rack['comments'] if rack['comments'] else 'N/A'}", ln=True)
-            pdf.ln(10)
-
-            devices = get_rack_devices(rack['id'])
-            for device in devices:
-                # Add Toc
-                pdf.add_toc_entry(device['name'], level=3)
-                # Add Devices
-                pdf.add_page()
-                pdf.set_font("Arial", size=14)
-                pdf.cell(200, 10, txt=f"Device Name: {device['name']}", ln=True, align='C')
-                pdf.ln(10)
-                pdf.set_font("Arial", size=12)
-                pdf.cell(200, 10, txt=f"Device Type: {device['device_type']['model']}", ln=True)
-                pdf.cell(200, 10, txt=f"Device Role: {device['role']['name']}", ln=True)
-                pdf.cell(200, 10, txt=f"Serial Number: {device['serial'] if device['serial'] else 'N/A'}", ln=True)
-                pdf.cell(200, 10, txt=f"Asset Tag: {device['asset_tag'] if device['asset_tag'] else 'N/A'}", ln=True)
-                pdf.cell(200, 10, txt=f"Site: {device['site']['name']}", ln=True)
-                pdf.cell(200, 10, txt=f"Location: {device['location']['name'] if device['location'] else 'N/A'}",
-                         ln=True)
-                pdf.ln(5)
-
-                # Add Interfaces
-                export_device_interfaces(pdf, device)
-
-                # Add Custom Fields if available
-                if 'custom_fields' in device:
-                    pdf.cell(200, 10, txt="Custom Fields:", ln=True)
-                    for field, value in device['custom_fields'].items():
-                        pdf.cell(200, 10, txt=f" - {field}: {value}", ln=True)
-                    pdf.ln(5)
-
-                # Add Rack Position if available
-                if 'rack' in device and device['rack']:
-                    pdf.cell(200, 10, txt=f"Rack: {device['rack']['name']}", ln=True)
-                    pdf.cell(200, 10, txt=f"Rack Position: {device['position']}", ln=True)
-                    pdf.cell(200, 10, txt=f"Face: {device['face']['label']}", ln=True)
-                    pdf.ln(5)
-
-        # Add Devices without Rack
-        for device in all_devices:
-            if device['id'] not in devices_processed:
-                # Add Toc
-                pdf.add_toc_entry(device['name'], level=3)
-                # Add Devices
-                pdf.add_page()
-                pdf.set_font("Arial", size=14)
-                pdf.cell(200, 10, txt=f"Device Name: {device['name']}", ln=True, align='C')
-                pdf.ln(10)
-                pdf.set_font("Arial", size=12)
-                pdf.cell(200, 10, txt=f"Device Type: {device['device_type']['model']}", ln=True)
-                pdf.cell(200, 10, txt=f"Device Role: {device['role']['name']}", ln=True)
-                pdf.cell(200, 10, txt=f"Serial Number: {device['serial'] if device['serial'] else 'N/A'}", ln=True)
-                pdf.cell(200, 10, txt=f"Site: {device['site']['name']}", ln=True)
-                pdf.ln(5)
-
-                # Add Interfaces
-                export_device_interfaces(pdf, device)
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export a NetBox tenant to PDF')
+    parser.add_argument('--tenant', default=TENANT_ID, help='Tenant ID (default: TENANT_ID)')
+    parser.add_argument('--snapshot-dir', default=os.getenv("SNAPSHOT_DIR"),
+                        help='Directory for the local snapshot cache (default: SNAPSHOT_DIR)')
+    parser.add_argument('--full-refresh', action='store_true',
+                        help='Ignore an existing snapshot and fetch everything again')
+    parser.add_argument('--offline', action='store_true',
+                        help='Render from the snapshot without contacting NetBox')
+    parser.add_argument('--tenants', type=lambda value: [int(tenant_id) for tenant_id in value.split(',')],
+                        default=[], help='Batch mode: comma-separated tenant IDs')
+    parser.add_argument('--tenant-filter', action='append', default=[], metavar='KEY=VALUE',
+                        help='Batch mode: NetBox tenant filter, e.g. group_id=3 (repeatable)')
+    parser.add_argument('--graphql', action='store_true', default=os.getenv("NETBOX_GRAPHQL") == "1",
+                        help='Fetch racks, components and cables via GraphQL, REST is used as fallback')
+    parser.add_argument('--images', action='store_true', default=os.getenv("NETBOX_IMAGES") == "1",
+                        help='Add device type images and rack elevations, cached in IMAGE_CACHE_DIR')
+    parser.add_argument('--fragment-dir', default=os.getenv("FRAGMENT_DIR"),
+                        help='Keep rendered sites, racks and devices here and only re-render changed ones '
+                             '(default: FRAGMENT_DIR)')
+    parser.add_argument('--format', choices=['pdf', *EXPORTERS], default='pdf',
+                        help='Output format: PDF report or machine-readable devices, ports and cables (default: pdf)')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Print request counts, latencies, cache hits and fetch/build/render times')
+    parser.add_argument('--metrics-json', metavar='FILE', help='Also write the metrics as JSON to FILE')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='Run under cProfile and write pstats to FILE, implies --metrics '
+                             '(batch mode: only the fetch in the main process is profiled)')
+    parser.add_argument('--processes', type=int, default=EXPORT_PROCESSES,
+                        help='Batch mode: number of render processes (default: available cores)')
+    args = parser.parse_args()
+    if args.offline and args.tenant_filter:
+        parser.error('--tenant-filter needs NetBox, use --tenants with --offline')
+    return args
 
-    # Add Table of Contents
-    pdf.add_toc_page()
 
-    # Save PDF with Tenant Name and Timestamp
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    pdf_filename = f"{tenant_data['name']}_{timestamp}.pdf"
-    pdf.output(pdf_filename)
-    pdf.output("test.pdf")
-    print(f"PDF wurde erfolgreich als '{pdf_filename}' erstellt.")
+# Funktion, um einen Tenant zu exportieren. Collector und Renderer laufen nebeneinander, verbunden über
+# eine begrenzte Queue. Gibt den aktualisierten Snapshot zurück.
+def export_tenant(tenant_id, snapshot=None, offline=False, keep_snapshot=True, graphql=False, output_format='pdf',
+                  image_dir=None, fragment_dir=None):
+    output_queue, collector, result = start_collector(tenant_id, snapshot, offline=offline,
+                                                      keep_snapshot=keep_snapshot, graphql=graphql,
+                                                      image_dir=image_dir)
+    try:
+        if output_format == 'pdf':
+            export_to_pdf(iter_queue(output_queue), fragment_dir)
+        else:
+            export_to_rows(iter_queue(output_queue), output_format)
+    except CollectorFailed:
+        # Die begonnene Ausgabe ist verworfen, weitergegeben wird der Fehler des Collectors
+        pass
+    except BaseException:
+        output_queue.cancel()
+        collector.join()
+        raise
+    collector.join()
+    if 'error' in result:
+        raise result['error']
+    return result.get('snapshot')
+
+
+# Worker im Batch-Modus: rendert einen Tenant vollständig aus seinem Snapshot. Mit collect_metrics werden die
+# Messwerte des Prozesses zurückgegeben, damit der Hauptprozess sie zusammenfassen kann.
+def export_tenant_snapshot(snapshot, output_format, collect_metrics=False, image_dir=None, fragment_dir=None):
+    metrics.reset()
+    metrics.enabled = collect_metrics
+    with metrics.section('render', 'tenant', snapshot['tenant']['name']):
+        export_tenant(snapshot['tenant']['id'], snapshot, offline=True, keep_snapshot=False,
+                      output_format=output_format, image_dir=image_dir, fragment_dir=fragment_dir)
+    return metrics.to_dict() if collect_metrics else None
+
+
+# Funktion, um die Snapshots mehrerer Tenants in einem Prozess-Pool zu rendern. Es werden höchstens doppelt so
+# viele Snapshots an den Pool übergeben wie Prozesse laufen, damit nicht alle gleichzeitig im Speicher liegen.
+# Gibt die Anzahl der fehlgeschlagenen Tenants zurück.
+def export_tenant_snapshots(snapshots, processes, output_format, image_dir=None, fragment_dir=None):
+    failed = 0
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = {}
+
+        def collect_results(futures):
+            nonlocal failed
+            for future in futures:
+                tenant_name = pending.pop(future)
+                try:
+                    tenant_metrics = future.result()
+                    if tenant_metrics:
+                        metrics.merge(tenant_metrics)
+                except Exception as error:
+                    failed += 1
+                    print(f'Fehler beim Export des Tenants: {error} [export_tenant_snapshots(snapshots), {tenant_name}]')
+
+        for snapshot in snapshots:
+            if len(pending) >= 2 * processes:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect_results(done)
+            pending[executor.submit(export_tenant_snapshot, snapshot, output_format, metrics.enabled, image_dir,
+                                    fragment_dir)] = snapshot['tenant']['name']
+        collect_results(wait(pending).done)
+    return failed
+
+
+# Batch-Modus: mehrere Tenants mit einem gemeinsamen Abruf laden und parallel rendern. Gibt False zurück, wenn
+# ein Tenant nicht exportiert werden konnte.
+def export_batch(args):
+    succeeded = True
+    if args.offline:
+        snapshots = []
+        for tenant_id in args.tenants:
+            snapshot = load_snapshot(get_snapshot_path(args.snapshot_dir, tenant_id)) if args.snapshot_dir else None
+            if snapshot is None:
+                print(f'Kein Snapshot für den Offline-Modus vorhanden [export_batch(args), {tenant_id}]')
+                succeeded = False
+            else:
+                snapshots.append(snapshot)
+    else:
+        tenants = get_batch_tenants(args.tenants, args.tenant_filter)
+        if not tenants:
+            print(f'Keine Tenants gefunden [export_batch(args), {args.tenants} {args.tenant_filter}]')
+            return False
+        snapshots = split_snapshot(fetch_shared_snapshot(tenants, args.graphql, get_image_dir(args)), tenants)
+        if args.snapshot_dir:
+            snapshots = save_snapshots(snapshots, args.snapshot_dir)
+    failed = export_tenant_snapshots(snapshots, args.processes, args.format, get_image_dir(args), args.fragment_dir)
+    return succeeded and not failed
+
+
+# Bilder gibt es nur im PDF-Bericht
+def get_image_dir(args):
+    return IMAGE_CACHE_DIR if args.images and args.format == 'pdf' else None
+
+
+# Funktion, um Tenant-Snapshots beim Durchreichen zu speichern
+def save_snapshots(snapshots, snapshot_dir):
+    for snapshot in snapshots:
+        save_snapshot(snapshot, get_snapshot_path(snapshot_dir, snapshot['tenant']['id']))
+        yield snapshot
 
 
 def main():
-    tenant_data = get_tenant_data(TENANT_ID)
-    locations = get_tenant_locations(TENANT_ID)
-    if tenant_data and locations is not None:
-        export_to_pdf(tenant_data, locations)
+    args = parse_args()
+    metrics.enabled = bool(args.metrics or args.metrics_json or args.profile)
+    metrics.profiling = bool(args.profile)
+    started = time.perf_counter()
+    with metrics.profile():
+        try:
+            succeeded = run(args)
+        except FetchError as error:
+            print(f'Fehler beim Abrufen der Daten, es wurde kein Bericht erstellt: {error} [main(), {args.tenant}]')
+            succeeded = False
+    client.close()
+
+    if metrics.enabled:
+        metrics.print_summary(time.perf_counter() - started)
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+    if args.profile:
+        metrics.write_profile(args.profile)
+    if not succeeded:
+        sys.exit(1)
+
+
+# Funktion, um den Export im gewählten Modus auszuführen. Gibt False zurück, wenn der Export fehlgeschlagen ist.
+def run(args):
+    if args.tenants or args.tenant_filter:
+        return export_batch(args)
+
+    snapshot_path = get_snapshot_path(args.snapshot_dir, args.tenant) if args.snapshot_dir else None
+    snapshot = load_snapshot(snapshot_path) if snapshot_path and not args.full_refresh else None
+    if args.offline and snapshot is None:
+        print(f'Kein Snapshot für den Offline-Modus vorhanden [main(), {snapshot_path}]')
+        return False
+
+    snapshot = export_tenant(args.tenant, snapshot, offline=args.offline, keep_snapshot=snapshot_path is not None,
+                             graphql=args.graphql, output_format=args.format, image_dir=get_image_dir(args),
+                             fragment_dir=args.fragment_dir)
+    if snapshot_path and not args.offline and snapshot:
+        save_snapshot(snapshot, snapshot_path)
+    return True
 
 
 # Main-Funktion
@@ -0,0 +1,88 @@
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# HTTP-Statuscodes, bei denen eine Anfrage wiederholt wird
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+# Gemeinsamer Client für alle NetBox-Anfragen. Hält eine Session mit Connection-Pool, damit
+# TCP-/TLS-Verbindungen wiederverwendet werden, und wiederholt fehlgeschlagene GETs mit Backoff.
+class NetBoxClient:
+    def __init__(self, base_url, headers, pool_size=10, retries=5, backoff_factor=0.5, timeout=30,
+                 endpoint_timeouts=None, metrics=None):
+        self.base_url = base_url
+        # Erfasst Latenz und Größe jeder Anfrage (--metrics), None = aus
+        self.metrics = metrics
+        self.timeout = timeout
+        self.endpoint_timeouts = endpoint_timeouts or {}
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            # Der Client liest nur; POST wird ausschließlich für GraphQL-Abfragen verwendet
+            allowed_methods=frozenset(['GET', 'HEAD', 'POST']),
+            respect_retry_after_header=True,
+            # Nach dem letzten Versuch die Antwort zurückgeben statt eine Exception zu werfen
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    # Timeout für einen Endpoint bestimmen, der längste passende Präfix gewinnt
+    def get_timeout(self, endpoint):
+        matches = [prefix for prefix in self.endpoint_timeouts if endpoint.startswith(prefix)]
+        if matches:
+            return self.endpoint_timeouts[max(matches, key=len)]
+        return self.timeout
+
+    # URL und Endpoint (für das Timeout) aus einem Endpoint relativ zur API-URL oder einer vollständigen URL
+    def resolve(self, endpoint):
+        if endpoint.startswith(('http://', 'https://')):
+            url = endpoint
+            endpoint = endpoint[len(self.base_url):] if endpoint.startswith(self.base_url) else endpoint
+        else:
+            url = f'{self.base_url}{endpoint}'
+        return url, endpoint
+
+    # GET-Anfrage an einen Endpoint (relativ zur API-URL) oder an eine vollständige URL wie einen next-Link
+    def get(self, endpoint, params=None, headers=None):
+        url, endpoint = self.resolve(endpoint)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self.session.get(url, params=params, headers=headers, timeout=self.get_timeout(endpoint))
+        except requests.RequestException as error:
+            print(f'Fehler bei der Verbindung zu NetBox: {error} [NetBoxClient.get(endpoint), {endpoint}]')
+        self.record(endpoint, started, response)
+        return response
+
+    # POST-Anfrage mit JSON-Body, z.B. eine GraphQL-Abfrage. GraphQL-Abfragen ändern nichts und werden
+    # deshalb wie GETs wiederholt.
+    def post(self, endpoint, payload):
+        url, endpoint = self.resolve(endpoint)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self.session.post(url, json=payload, timeout=self.get_timeout(endpoint))
+        except requests.RequestException as error:
+            print(f'Fehler bei der Verbindung zu NetBox: {error} [NetBoxClient.post(endpoint), {endpoint}]')
+        self.record(endpoint, started, response)
+        return response
+
+    # Dauer (einschließlich Wiederholungen) und Größe einer Anfrage erfassen
+    def record(self, endpoint, started, response):
+        if self.metrics is None or not self.metrics.enabled:
+            return
+        failed = response is None or response.status_code >= 400
+        self.metrics.record_request(endpoint, time.perf_counter() - started,
+                                    len(response.content) if response is not None else 0, failed)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,151 @@
+import re
+
+# Abfragen über die GraphQL-API von NetBox (ab 4.0). Racks, Komponenten und Kabel einer Gruppe von Standorten
+# und Geräten werden mit einer einzigen Abfrage geladen und in die Form der REST-Objekte gebracht, damit
+# Snapshot, Export-Modell und Renderer unverändert bleiben.
+
+# Zuordnung der GraphQL-Typen der Kabelenden zu den Objekttypen der REST-API
+TERMINATION_TYPES = {
+    'InterfaceType': 'dcim.interface',
+    'FrontPortType': 'dcim.frontport',
+    'RearPortType': 'dcim.rearport',
+}
+
+TERMINATION_FIELDS = ' '.join(f'... on {type_name} {{ id name device {{ id name }} }}' for type_name in TERMINATION_TYPES)
+
+CABLE_FRAGMENT = f'''
+fragment CableFields on CableType {{
+  id type length length_unit color
+  a_terminations {{ __typename {TERMINATION_FIELDS} }}
+  b_terminations {{ __typename {TERMINATION_FIELDS} }}
+}}
+'''
+
+RACK_FRAGMENT = '''
+fragment RackFields on RackType {
+  id name site { id name } tenant { id } facility_id type width u_height status serial asset_tag
+  role { name } comments
+}
+'''
+
+# Felder der Komponenten eines Geräts, die Kabel werden jeweils mitgeladen
+COMPONENT_FIELDS = {
+    'interfaces': '''interfaces {
+    id name type cable { ...CableFields } untagged_vlan { vid name } tagged_vlans { vid name }
+    ip_addresses { address }
+  }''',
+    'frontports': 'frontports { id name type cable { ...CableFields } rear_port { id name } rear_port_position }',
+    'rearports': 'rearports { id name type cable { ...CableFields } positions }',
+}
+
+# Präfixe der Enum-Namen, unter denen NetBox die Auswahlfelder in GraphQL ausgibt, z.B. TYPE_1000BASE_T
+CHOICE_PREFIXES = {
+    'type': 'TYPE_',
+    'status': 'STATUS_',
+    'width': 'WIDTH_',
+    'length_unit': 'UNIT_',
+}
+
+
+# Abfrage für eine Gruppe von Standorten (Racks) und Geräten (Komponenten mit Kabeln) über Aliase aufbauen.
+# GraphQL lehnt unbenutzte Fragmente ab, deshalb werden nur die benötigten angehängt.
+def build_tree_query(site_ids, device_ids, collections=tuple(COMPONENT_FIELDS)):
+    fields = [f's{site_id}: site(id: {site_id}) {{ racks {{ ...RackFields }} }}' for site_id in site_ids]
+    fields.extend(f'd{device_id}: device(id: {device_id}) {{ ...DeviceTree }}' for device_id in device_ids)
+    query = 'query {\n' + '\n'.join(fields) + '\n}\n'
+    if site_ids:
+        query += RACK_FRAGMENT
+    if device_ids:
+        device_fields = '\n  '.join(COMPONENT_FIELDS[collection] for collection in collections)
+        query += f'fragment DeviceTree on DeviceType {{\n  {device_fields}\n}}\n' + CABLE_FRAGMENT
+    return query
+
+
+# Auswahlfeld in die Form der REST-API bringen. GraphQL liefert je nach NetBox-Version den Wert oder den
+# Enum-Namen, aber nie das Label; das Label wird deshalb aus dem Wert abgeleitet.
+def get_choice(value, field, upper_label=False):
+    if value is None or value == '':
+        return None
+    value = str(value)
+    if re.fullmatch(r'[A-Z0-9_]+', value):
+        value = value.removeprefix(CHOICE_PREFIXES.get(field, '')).removeprefix('A_').lower().replace('_', '-')
+    label = value.upper() if upper_label else value.replace('-', ' ').capitalize()
+    return {'value': value, 'label': label}
+
+
+def convert_termination(termination):
+    object_type = TERMINATION_TYPES.get(termination.get('__typename'))
+    if object_type is None:
+        return None
+    return {
+        'object_type': object_type,
+        'object_id': int(termination['id']),
+        'object': {'id': int(termination['id']), 'name': termination['name'],
+                   'device': {'id': int(termination['device']['id']), 'name': termination['device']['name']}},
+    }
+
+
+def convert_cable(cable):
+    return {
+        'id': int(cable['id']),
+        'type': cable['type'] or '',
+        'length': cable['length'],
+        'length_unit': get_choice(cable['length_unit'], 'length_unit'),
+        'color': cable['color'],
+        'a_terminations': [termination for termination in map(convert_termination, cable['a_terminations'])
+                           if termination],
+        'b_terminations': [termination for termination in map(convert_termination, cable['b_terminations'])
+                           if termination],
+    }
+
+
+def convert_rack(rack):
+    width = rack['width']
+    if isinstance(width, str):
+        width = int(width.removeprefix(CHOICE_PREFIXES['width']))
+    return {
+        'id': int(rack['id']),
+        'name': rack['name'],
+        'site': {'id': int(rack['site']['id']), 'name': rack['site']['name']},
+        'tenant': {'id': int(rack['tenant']['id'])} if rack['tenant'] else None,
+        'facility_id': rack['facility_id'],
+        'type': get_choice(rack['type'], 'type'),
+        'width': {'value': width, 'label': f'{width} inches'},
+        'u_height': rack['u_height'],
+        'status': get_choice(rack['status'], 'status'),
+        'serial': rack['serial'],
+        'asset_tag': rack['asset_tag'],
+        'role': rack['role'],
+        'comments': rack['comments'],
+    }
+
+
+# Komponente eines Geräts umwandeln. Das Gerät wird nicht je Komponente abgefragt, sondern aus dem Alias übernommen.
+def convert_component(component, device_id, cables):
+    record = dict(component, id=int(component['id']), device={'id': device_id},
+                  type=get_choice(component['type'], 'type', upper_label=True))
+    if component['cable']:
+        cable = convert_cable(component['cable'])
+        cables[cable['id']] = cable
+        record['cable'] = {'id': cable['id']}
+    if component.get('rear_port'):
+        record['rear_port'] = {'id': int(component['rear_port']['id']), 'name': component['rear_port']['name']}
+    return record
+
+
+# Antwort der Abfrage in Listen von REST-Objekten je Sammlung umwandeln (wie get_bulk_records)
+def convert_tree(data):
+    records = {'racks': [], 'interfaces': [], 'frontports': [], 'rearports': []}
+    cables = {}
+    for alias, value in data.items():
+        if value is None:
+            continue
+        if alias.startswith('s'):
+            records['racks'].extend(convert_rack(rack) for rack in value['racks'])
+        else:
+            device_id = int(alias[1:])
+            for collection in COMPONENT_FIELDS:
+                records[collection].extend(convert_component(component, device_id, cables)
+                                           for component in value.get(collection, []))
+    records['cables'] = list(cables.values())
+    return records
@@ -0,0 +1,169 @@
+import datetime
+import gzip
+import json
+import os
+from collections import defaultdict
+
+# Version des Snapshot-Formats, ältere Snapshots werden verworfen
+SNAPSHOT_VERSION = 1
+
+# Objekt-Sammlungen im Snapshot, jeweils nach ID indiziert
+COLLECTIONS = ('sites', 'racks', 'devices', 'interfaces', 'frontports', 'rearports', 'cables', 'device_types')
+
+# Zuordnung der NetBox-Objekttypen (Changelog) zu den Sammlungen im Snapshot
+OBJECT_TYPES = {
+    'dcim.site': 'sites',
+    'dcim.rack': 'racks',
+    'dcim.device': 'devices',
+    'dcim.interface': 'interfaces',
+    'dcim.frontport': 'frontports',
+    'dcim.rearport': 'rearports',
+    'dcim.cable': 'cables',
+    'dcim.devicetype': 'device_types',
+}
+
+
+def get_snapshot_path(snapshot_dir, tenant_id):
+    return os.path.join(snapshot_dir, f'tenant_{tenant_id}.json.gz')
+
+
+def new_snapshot():
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'fetched_at': None,
+        'tenant': None,
+    }
+    for collection in COLLECTIONS:
+        snapshot[collection] = {}
+    return snapshot
+
+
+# Snapshot von der Festplatte laden, None wenn keiner vorhanden oder das Format veraltet ist
+def load_snapshot(path):
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        data = json.load(file)
+    if data.get('version') != SNAPSHOT_VERSION:
+        print(f'Snapshot-Format veraltet, wird neu erstellt [load_snapshot(path), {path}]')
+        return None
+    snapshot = new_snapshot()
+    snapshot['fetched_at'] = data['fetched_at']
+    snapshot['tenant'] = data['tenant']
+    for collection in COLLECTIONS:
+        snapshot[collection] = {record['id']: record for record in data.get(collection, [])}
+    return snapshot
+
+
+# Snapshot komprimiert speichern. Es wird zuerst in eine temporäre Datei geschrieben, damit ein
+# abgebrochener Lauf keinen halben Snapshot hinterlässt.
+def save_snapshot(snapshot, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    data = {
+        'version': snapshot['version'],
+        'fetched_at': snapshot['fetched_at'],
+        'tenant': snapshot['tenant'],
+    }
+    for collection in COLLECTIONS:
+        data[collection] = list(snapshot[collection].values())
+    temp_path = f'{path}.tmp'
+    with gzip.open(temp_path, 'wt', encoding='utf-8') as file:
+        json.dump(data, file, separators=(',', ':'))
+    os.replace(temp_path, path)
+
+
+# Geänderte oder neue Objekte in eine Sammlung übernehmen
+def merge_records(snapshot, collection, records):
+    target = snapshot[collection]
+    for record in records:
+        target[record['id']] = record
+
+
+# Objekte aus einer Sammlung entfernen, die eine Bedingung erfüllen
+def prune_records(snapshot, collection, predicate):
+    target = snapshot[collection]
+    for record_id in [record_id for record_id, record in target.items() if predicate(record)]:
+        del target[record_id]
+
+
+# Objekte nach einem Schlüssel (z.B. Geräte-ID) gruppieren. Innerhalb einer Gruppe sind die Objekte nach ID
+# abgelegt, sodass spätere Änderungen mit derselben Funktion an ihrer bisherigen Position ersetzt werden.
+def group_records(records, key, groups=None):
+    if groups is None:
+        groups = defaultdict(dict)
+    for record in records:
+        groups[key(record)][record['id']] = record
+    return groups
+
+
+# Kabel nach den Geräten an beiden Enden gruppieren
+def group_cables_by_device(cables):
+    groups = defaultdict(dict)
+    for cable in cables:
+        for termination in cable['a_terminations'] + cable['b_terminations']:
+            device = termination['object'].get('device')
+            if device:
+                groups[device['id']][cable['id']] = cable
+    return groups
+
+
+# Gemeinsamen Snapshot mehrerer Tenants in Snapshots einzelner Tenants aufteilen. Die Snapshots werden
+# nacheinander erzeugt, damit nicht alle Teil-Snapshots gleichzeitig im Speicher liegen.
+def split_snapshot(shared, tenants):
+    def get_tenant_id(record):
+        return record['tenant']['id'] if record.get('tenant') else None
+
+    sites_by_tenant = group_records(shared['sites'].values(), get_tenant_id)
+    devices_by_tenant = group_records(shared['devices'].values(), get_tenant_id)
+    racks_by_site = group_records(shared['racks'].values(), lambda rack: rack['site']['id'])
+    components_by_device = {
+        collection: group_records(shared[collection].values(), lambda component: component['device']['id'])
+        for collection in ('interfaces', 'frontports', 'rearports')
+    }
+    cables_by_device = group_cables_by_device(shared['cables'].values())
+
+    for tenant in tenants:
+        snapshot = new_snapshot()
+        snapshot['fetched_at'] = shared['fetched_at']
+        snapshot['tenant'] = tenant
+        snapshot['sites'] = dict(sites_by_tenant.get(tenant['id'], {}))
+        snapshot['devices'] = dict(devices_by_tenant.get(tenant['id'], {}))
+        for site_id in snapshot['sites']:
+            snapshot['racks'].update(racks_by_site.get(site_id, {}))
+        for device_id in snapshot['devices']:
+            for collection, groups in components_by_device.items():
+                snapshot[collection].update(groups.get(device_id, {}))
+            snapshot['cables'].update(cables_by_device.get(device_id, {}))
+        for device in snapshot['devices'].values():
+            device_type = shared['device_types'].get(device['device_type']['id'])
+            if device_type:
+                snapshot['device_types'][device_type['id']] = device_type
+        yield snapshot
+
+
+# Aktuelle Namen verknüpfter Objekte. Eingebettete Kopien wie device['rack']['name'] oder der Gerätename am
+# Kabelende aktualisiert ein inkrementeller Abruf nicht, wenn nur das verknüpfte Objekt umbenannt wurde. Sie werden
+# deshalb über die ID im Snapshot nachgeschlagen; Objekte außerhalb des Snapshots (z.B. Geräte anderer Tenants)
+# behalten den eingebetteten Namen.
+class NameIndex:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def get(self, collection, nested, key='name'):
+        if not nested:
+            return None
+        record = self.snapshot[collection].get(nested['id'])
+        return (record or nested)[key]
+
+    # Geräte- und Portname eines Kabelendes
+    def get_termination_names(self, object_type, component):
+        collection = OBJECT_TYPES.get(object_type)
+        if collection:
+            component = self.snapshot[collection].get(component['id']) or component
+        return self.get('devices', component.get('device')), component.get('name')
+
+
+# Zeitstempel für last_updated__gte. Ein kleiner Puffer fängt Uhrzeitabweichungen zum NetBox-Server ab.
+def get_refresh_timestamp(skew_seconds=60):
+    now = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=skew_seconds)
+    return now.isoformat(timespec='seconds')
@@ -0,0 +1,482 @@
+import os
+import re
+import tempfile
+import zlib
+from collections import defaultdict
+
+from fpdf import FPDF, FPDF_VERSION
+
+# Das Dokument wird seitenweise in eine temporäre Datei geschrieben: Jede fertige Seite wird sofort komprimiert,
+# geschrieben und aus dem Speicher entfernt. Seitenbaum, Schriften, Bilder und Links folgen beim Abschluss.
+# Setzt die Interna von PyFPDF 1.7 voraus. Mit anderen Versionen (fpdf2) schreibt die Basisklasse das Dokument wie
+# bisher in output(), ohne Lesezeichen, Fragmente und vorgezogenes Inhaltsverzeichnis.
+STREAMING = FPDF_VERSION.startswith('1.')
+
+ROMAN_NUMERALS = ((1000, 'm'), (900, 'cm'), (500, 'd'), (400, 'cd'), (100, 'c'), (90, 'xc'), (50, 'l'), (40, 'xl'),
+                  (10, 'x'), (9, 'ix'), (5, 'v'), (4, 'iv'), (1, 'i'))
+
+
+# Schrift- und Bildaufrufe im Seiteninhalt, deren Nummern beim Wiedereinfügen angepasst werden
+FONT_PATTERN = re.compile(r'/F(\d+) (\d+\.\d+ Tf)')
+IMAGE_PATTERN = re.compile(r'/I(\d+) Do')
+
+
+def to_roman(number):
+    result = ''
+    for value, numeral in ROMAN_NUMERALS:
+        count, number = divmod(number, value)
+        result += numeral * count
+    return result
+
+
+class StreamingFPDF(FPDF):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stream = None
+        self.stream_path = None
+        # Anzahl bereits in die Datei geschriebener Bytes, Basis für die Offsets der Objekte
+        self.stream_offset = 0
+        # Objektnummern der Seiten in Seitenreihenfolge
+        self.page_objects = []
+        # Links geschriebener Seiten, deren Ziele erst beim Abschluss feststehen: (Objektnummer, Links)
+        self.pending_links = []
+        # Lesezeichen (PDF-Outline): (Titel, Ebene, Seite, y)
+        self.outlines = []
+        self.outline_root = None
+        # Seiten, die zuletzt gezeichnet, aber an einer früheren Stelle einsortiert werden (z.B. das
+        # Inhaltsverzeichnis): Position im Dokument und erste reservierte Seite in Zeichenreihenfolge
+        self.reserved_slot = None
+        self.reserved_start = None
+        # Laufende Aufzeichnungen von Abschnitten (Fragmente), verschachtelt wie Standort, Rack und Gerät
+        self.fragments = []
+        # Länge des Seiteninhalts vor der Fußzeile der zuletzt beendeten Seite
+        self.footer_offset = None
+        if STREAMING:
+            # Die temporäre Datei liegt im Zielverzeichnis, damit sie am Ende nur umbenannt werden muss
+            handle, self.stream_path = tempfile.mkstemp(prefix='.', suffix='.pdf.part', dir='.')
+            self.stream = os.fdopen(handle, 'wb')
+            self.header_version = self.pdf_version
+            self._putheader()
+            self.flush_buffer()
+
+    # Platz für Seiten reservieren, die hinter der aktuellen Seite eingefügt, aber erst am Ende gezeichnet werden
+    def reserve_pages(self):
+        self.reserved_slot = self.page
+
+    # Ab hier gezeichnete Seiten füllen den reservierten Platz
+    def begin_reserved_pages(self):
+        if self.reserved_slot is not None and self.stream:
+            self.reserved_start = self.page + 1
+
+    # Seitennummer für die Fußzeile: reservierte Seiten werden römisch gezählt, alle anderen in Zeichenreihenfolge
+    def page_label(self, page=None):
+        page = page or self.page
+        if self.reserved_start and page >= self.reserved_start:
+            return to_roman(page - self.reserved_start + 1)
+        return str(page)
+
+    def add_outline(self, title, level, page=None, y=0):
+        page = page or self.page
+        self.outlines.append((title, level, page, y))
+        if self.fragments:
+            # Lesezeichen stehen im Fragment an ihrer Stelle zwischen den Seiteninhalten
+            recording = self.fragments[-1]
+            self.add_segment(recording, self.get_page_length())
+            recording['parts'].append({'outline': (title, level, page - self.page, y)})
+
+    # Fußzeile zeichnen und die aktuelle Seite abschließen, wie add_page() und close() es tun
+    def end_page(self):
+        self.footer_offset = len(self.pages[self.page])
+        self.in_footer = 1
+        self.footer()
+        self.in_footer = 0
+        self._endpage()
+
+    def add_page(self, *args, **kwargs):
+        if self.stream and self.page > 0:
+            self.footer_offset = len(self.pages[self.page])
+        super().add_page(*args, **kwargs)
+
+    # fpdf2 kennt kein close(), dort schließt output() das Dokument ab
+    def close(self):
+        if not STREAMING:
+            return
+        if self.state < 3 and self.page > 0:
+            self.footer_offset = len(self.pages[self.page])
+        super().close()
+
+    def get_page_length(self):
+        return len(self.pages[self.page]) if self.stream and self.page > 0 else 0
+
+    # Aufzeichnung eines Abschnitts beginnen. Abschnitte beginnen mit einer neuen Seite, ihre Seiten hängen deshalb
+    # nur von ihren Daten ab und können in einem späteren Dokument an anderer Stelle eingefügt werden. Aufgezeichnet
+    # wird nur der innerste Abschnitt; ein übergeordneter Abschnitt erhält an dieser Stelle den Schlüssel des
+    # Unterabschnitts, damit jede Seite nur in einem Fragment liegt und nur ein Gerät gleichzeitig im Speicher.
+    def begin_fragment(self, key):
+        if self.fragments:
+            self.add_segment(self.fragments[-1], self.get_page_length())
+        self.fragments.append({'key': key, 'parts': [], 'page': self.page, 'offset': self.get_page_length(),
+                               'cacheable': bool(self.stream)})
+
+    # Aufzeichnung beenden. Das Fragment enthält Seiteninhalte ohne Fußzeile, Lesezeichen und Schlüssel von
+    # Unterabschnitten in Zeichenreihenfolge sowie den Zeichenzustand am Ende; ohne Stream oder mit Links auf den
+    # Seiten None.
+    def end_fragment(self):
+        recording = self.fragments.pop()
+        self.add_segment(recording, self.get_page_length())
+        if self.fragments:
+            self.add_child(self.fragments[-1], recording['key'], recording['cacheable'])
+        if not recording['cacheable']:
+            return None
+        return {
+            'parts': recording['parts'],
+            'state': {
+                'font': (self.font_family, self.font_style, self.font_size_pt, self.underline),
+                'line_width': self.line_width,
+                'draw_color': self.draw_color,
+                'fill_color': self.fill_color,
+                'text_color': self.text_color,
+                'color_flag': self.color_flag,
+            },
+        }
+
+    # Inhalt der aktuellen Seite seit dem letzten Abschnitt der Aufzeichnung übernehmen. Beginnt die Seite innerhalb
+    # der Aufzeichnung, wird sie beim Einfügen neu angelegt, sonst wird der Inhalt an die offene Seite angehängt.
+    def add_segment(self, recording, length):
+        new_page = self.page != recording['page']
+        start = 0 if new_page else recording['offset']
+        if new_page or length > start:
+            recording['parts'].append({'page': self.get_page_record(self.page, start, length, new_page)})
+            recording['cacheable'] = recording['cacheable'] and self.page not in self.page_links
+        recording['page'] = self.page
+        recording['offset'] = length
+
+    # Unterabschnitt in der Aufzeichnung des übergeordneten Abschnitts vermerken
+    def add_child(self, recording, key, cacheable=True):
+        recording['parts'].append({'fragment': key})
+        recording['cacheable'] = recording['cacheable'] and cacheable
+        recording['page'] = self.page
+        recording['offset'] = self.get_page_length()
+
+    # Ausschnitt einer Seite mit den verwendeten Schriften und Bildern
+    def get_page_record(self, page, start, length, new_page):
+        content = self.pages[page][start:length]
+        fonts = {info['i']: key for key, info in self.fonts.items()}
+        images = {info['i']: name for name, info in self.images.items()}
+        return {
+            'new_page': new_page,
+            'orientation': self.cur_orientation,
+            'content': content,
+            'fonts': {index: fonts[int(index)] for index, _ in FONT_PATTERN.findall(content)},
+            'images': {index: images[int(index)] for index in IMAGE_PATTERN.findall(content)},
+        }
+
+    # Fragment hinter der aktuellen Seite einfügen, load liefert die Fragmente der Unterabschnitte. Schriften und
+    # Bilder werden im Dokument angemeldet und ihre Nummern angepasst, die Fußzeilen mit den neuen Seitenzahlen
+    # gezeichnet. Eine laufende Aufzeichnung erhält nur den Schlüssel des Fragments.
+    def replay_fragment(self, key, fragment, load):
+        if not self.stream:
+            return False
+        parent = self.fragments[-1] if self.fragments else None
+        if parent is not None:
+            self.add_segment(parent, self.get_page_length())
+        recordings, self.fragments = self.fragments, []
+        try:
+            self.replay_parts(fragment, load)
+        finally:
+            self.fragments = recordings
+        if parent is not None:
+            self.add_child(parent, key)
+        return True
+
+    def replay_parts(self, fragment, load):
+        for part in fragment['parts']:
+            if 'fragment' in part:
+                self.replay_parts(load(part['fragment']), load)
+            elif 'outline' in part:
+                title, level, offset, y = part['outline']
+                self.replay_outline(title, level, self.page + offset, y)
+            else:
+                page = part['page']
+                if page['new_page']:
+                    if self.page > 0:
+                        self.end_page()
+                    self._beginpage(page['orientation'])
+                fonts = {index: str(self.register_font(key)['i']) for index, key in page['fonts'].items()}
+                images = {index: str(self.register_image(name)['i']) for index, name in page['images'].items()}
+                content = FONT_PATTERN.sub(lambda match: f'/F{fonts[match.group(1)]} {match.group(2)}',
+                                           page['content'])
+                self.pages[self.page] += IMAGE_PATTERN.sub(lambda match: f'/I{images[match.group(1)]} Do', content)
+
+        state = fragment['state']
+        family, style, size, underline = state['font']
+        if family:
+            self.current_font = self.register_font(family + style)
+        self.font_family, self.font_style, self.font_size_pt, self.underline = family, style, size, underline
+        self.font_size = size / self.k
+        self.line_width = state['line_width']
+        self.draw_color = state['draw_color']
+        self.fill_color = state['fill_color']
+        self.text_color = state['text_color']
+        self.color_flag = state['color_flag']
+
+    # Lesezeichen eines eingefügten Fragments, Unterklassen können weitere Verweise (z.B. Inhaltsverzeichnis) anlegen
+    def replay_outline(self, title, level, page, y):
+        self.add_outline(title, level, page, y)
+
+    # Schrift anmelden, ohne sie im Seiteninhalt auszuwählen
+    def register_font(self, key):
+        if key not in self.fonts:
+            state = (self.page, self.font_family, self.font_style, self.font_size_pt, self.font_size,
+                     self.current_font, self.underline, self.unifontsubset)
+            self.page = 0
+            self.font_family = ''
+            self.set_font(key.rstrip('BI'), key[len(key.rstrip('BI')):])
+            (self.page, self.font_family, self.font_style, self.font_size_pt, self.font_size,
+             self.current_font, self.underline, self.unifontsubset) = state
+        return self.fonts[key]
+
+    # Bild anmelden, ohne es zu zeichnen
+    def register_image(self, name):
+        if name not in self.images:
+            info = self._parsepng(name) if name.lower().endswith('.png') else self._parsejpg(name)
+            info['i'] = len(self.images) + 1
+            self.images[name] = info
+        return self.images[name]
+
+    def flush_buffer(self):
+        data = self.buffer.encode('latin1')
+        self.stream.write(data)
+        self.stream_offset += len(data)
+        self.buffer = ''
+
+    # Offset des nächsten Objekts in der Datei
+    def get_offset(self):
+        return self.stream_offset + len(self.buffer)
+
+    def _newobj(self):
+        if not self.stream:
+            return super()._newobj()
+        self.n += 1
+        self.offsets[self.n] = self.get_offset()
+        self._out(f'{self.n} 0 obj')
+
+    # Objektnummer vergeben, deren Objekt erst später geschrieben wird
+    def reserve_object(self):
+        self.n += 1
+        return self.n
+
+    def begin_object(self, number):
+        self.offsets[number] = self.get_offset()
+        self._out(f'{number} 0 obj')
+
+    def _endpage(self):
+        super()._endpage()
+        # Abgeschlossene Seite in die Aufzeichnung des innersten Abschnitts übernehmen
+        if self.fragments:
+            self.add_segment(self.fragments[-1], self.footer_offset)
+        if self.stream:
+            self.write_page(self.page)
+
+    def write_page(self, page):
+        page_object = self.n + 1
+        self._newobj()
+        self._out('<</Type /Page')
+        self._out('/Parent 1 0 R')
+        if page in self.orientation_changes:
+            self._out('/MediaBox [0 0 %.2f %.2f]' % (self.fh_pt, self.fw_pt) if self.def_orientation == 'P'
+                      else '/MediaBox [0 0 %.2f %.2f]' % (self.fw_pt, self.fh_pt))
+        self._out('/Resources 2 0 R')
+        if page in self.page_links:
+            annots_object = self.reserve_object()
+            self.pending_links.append((annots_object, self.page_links.pop(page)))
+            self._out(f'/Annots {annots_object} 0 R')
+        if self.pdf_version > '1.3':
+            self._out('/Group <</Type /Group /S /Transparency /CS /DeviceRGB>>')
+        self._out(f'/Contents {self.n + 1} 0 R>>')
+        self._out('endobj')
+
+        content = self.pages[page].encode('latin1')
+        self.pages[page] = ''
+        if self.compress:
+            content = zlib.compress(content)
+        self._newobj()
+        self._out('<<' + ('/Filter /FlateDecode ' if self.compress else '') + f'/Length {len(content)}>>')
+        self._putstream(content)
+        self._out('endobj')
+        self.page_objects.append(page_object)
+        self.flush_buffer()
+
+    # Höhe einer Seite in Punkten, abhängig von ihrer Ausrichtung
+    def get_page_height(self, page):
+        portrait = (self.def_orientation == 'P') != (page in self.orientation_changes)
+        return self.fh_pt if portrait else self.fw_pt
+
+    def put_links(self):
+        for annots_object, links in self.pending_links:
+            self.begin_object(annots_object)
+            annots = '['
+            for x, y, w, h, link in links:
+                rect = '%.2f %.2f %.2f %.2f' % (x, y, x + w, y - h)
+                annots += '<</Type /Annot /Subtype /Link /Rect [' + rect + '] /Border [0 0 0] '
+                if isinstance(link, str):
+                    annots += '/A <</S /URI /URI ' + self._textstring(link) + '>>>>'
+                else:
+                    annots += '/Dest ' + self.get_destination(*self.links[link]) + '>>'
+            self._out(annots + ']')
+            self._out('endobj')
+        self.pending_links = []
+
+    # Objektnummern der Seiten in der endgültigen Reihenfolge, reservierte Seiten an ihrem Platz
+    def get_page_order(self):
+        if not self.reserved_start:
+            return self.page_objects
+        slot, start = self.reserved_slot, self.reserved_start - 1
+        return self.page_objects[:slot] + self.page_objects[start:] + self.page_objects[slot:start]
+
+    def _putpages(self):
+        self.offsets[1] = self.get_offset()
+        self._out('1 0 obj')
+        self._out('<</Type /Pages')
+        self._out('/Kids [' + ' '.join(f'{page_object} 0 R' for page_object in self.get_page_order()) + ']')
+        self._out(f'/Count {len(self.page_objects)}')
+        if self.def_orientation == 'P':
+            self._out('/MediaBox [0 0 %.2f %.2f]' % (self.fw_pt, self.fh_pt))
+        else:
+            self._out('/MediaBox [0 0 %.2f %.2f]' % (self.fh_pt, self.fw_pt))
+        self._out('>>')
+        self._out('endobj')
+
+    def get_destination(self, page, y):
+        return '[%d 0 R /XYZ 0 %.2f null]' % (self.page_objects[page - 1], self.get_page_height(page) - y * self.k)
+
+    # Lesezeichen als Baum schreiben. Übergeordnet ist jeweils der letzte vorherige Eintrag mit kleinerer Ebene,
+    # Ebenen dürfen also übersprungen werden. Einträge mit Unterpunkten sind anfangs zugeklappt.
+    def put_outlines(self):
+        if not self.outlines:
+            return
+        parents = []
+        stack = []
+        for index, (_, level, _, _) in enumerate(self.outlines):
+            while stack and self.outlines[stack[-1]][1] >= level:
+                stack.pop()
+            parents.append(stack[-1] if stack else None)
+            stack.append(index)
+        children = defaultdict(list)
+        positions = []
+        for index, parent in enumerate(parents):
+            positions.append(len(children[parent]))
+            children[parent].append(index)
+
+        first_object = self.n + 1
+        self.outline_root = first_object + len(self.outlines)
+        for index, (title, _, page, y) in enumerate(self.outlines):
+            parent = parents[index]
+            siblings = children[parent]
+            position = positions[index]
+            self._newobj()
+            self._out('<</Title ' + self._textstring(title))
+            self._out(f'/Parent {self.outline_root if parent is None else first_object + parent} 0 R')
+            if position > 0:
+                self._out(f'/Prev {first_object + siblings[position - 1]} 0 R')
+            if position < len(siblings) - 1:
+                self._out(f'/Next {first_object + siblings[position + 1]} 0 R')
+            if children[index]:
+                self._out(f'/First {first_object + children[index][0]} 0 R')
+                self._out(f'/Last {first_object + children[index][-1]} 0 R')
+                self._out(f'/Count -{len(children[index])}')
+            self._out('/Dest ' + self.get_destination(page, y) + '>>')
+            self._out('endobj')
+        self._newobj()
+        self._out('<</Type /Outlines')
+        self._out(f'/First {first_object + children[None][0]} 0 R')
+        self._out(f'/Last {first_object + children[None][-1]} 0 R')
+        self._out(f'/Count {len(children[None])}>>')
+        self._out('endobj')
+        self.flush_buffer()
+
+    def _putresources(self):
+        if not self.stream:
+            return super()._putresources()
+        self._putfonts()
+        self._putimages()
+        self.offsets[2] = self.get_offset()
+        self._out('2 0 obj')
+        self._out('<<')
+        self._putresourcedict()
+        self._out('>>')
+        self._out('endobj')
+
+    def _putcatalog(self):
+        super()._putcatalog()
+        if not self.stream:
+            return
+        # Bilder mit Transparenz heben die Version an, nachdem der Dateikopf bereits geschrieben ist
+        if self.pdf_version > self.header_version:
+            self._out(f'/Version /{self.pdf_version}')
+        if self.outline_root:
+            self._out(f'/Outlines {self.outline_root} 0 R')
+            self._out('/PageMode /UseOutlines')
+        # Seitenbeschriftung im Viewer passend zur Fußzeile
+        if self.reserved_start:
+            slot, count = self.reserved_slot, self.page - self.reserved_start + 1
+            self._out(f'/PageLabels <</Nums [0 <</S /D>> {slot} <</S /r>> {slot + count} <</S /D /St {slot + 1}>>]>>')
+
+    def _enddoc(self):
+        if not self.stream:
+            return super()._enddoc()
+        self.put_links()
+        self._putpages()
+        self._putresources()
+        self.put_outlines()
+        self._newobj()
+        self._out('<<')
+        self._putinfo()
+        self._out('>>')
+        self._out('endobj')
+        self._newobj()
+        self._out('<<')
+        self._putcatalog()
+        self._out('>>')
+        self._out('endobj')
+        xref_offset = self.get_offset()
+        self._out('xref')
+        self._out(f'0 {self.n + 1}')
+        self._out('0000000000 65535 f ')
+        for number in range(1, self.n + 1):
+            self._out('%010d 00000 n ' % self.offsets[number])
+        self._out('trailer')
+        self._out('<<')
+        self._puttrailer()
+        self._out('>>')
+        self._out('startxref')
+        self._out(xref_offset)
+        self._out('%%EOF')
+        self.flush_buffer()
+        self.stream.close()
+        self.state = 3
+
+    # Dokument abschließen und die temporäre Datei unter ihrem endgültigen Namen ablegen
+    def output(self, name='', dest=''):
+        if not self.stream_path:
+            # fpdf2 kennt den Parameter dest nicht mehr
+            return super().output(name, dest) if dest else super().output(name)
+        if dest.upper() not in ('', 'F') or not name:
+            self.error('Streaming output can only be written to a file')
+        if self.state < 3:
+            self.close()
+        # mkstemp legt die Datei nur für den Besitzer lesbar an, das fertige PDF erhält die üblichen Rechte
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(self.stream_path, 0o666 & ~umask)
+        os.replace(self.stream_path, name)
+        self.stream_path = None
+        return ''
+
+    # Unfertiges Dokument verwerfen, z.B. nach einem Fehler beim Rendern
+    def discard(self):
+        if self.stream:
+            self.stream.close()
+        if self.stream_path and os.path.exists(self.stream_path):
+            os.remove(self.stream_path)
+        self.stream_path = None
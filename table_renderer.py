@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+from typing import Callable
+
+from fpdf import FPDF_VERSION
+
+# Der schnelle Pfad schreibt die Zeichenbefehle einer Zeile direkt in den Seiteninhalt und setzt
+# die Interna von PyFPDF 1.7 voraus. Andere Versionen zeichnen Zelle für Zelle über cell().
+FAST_PATH = FPDF_VERSION.startswith('1.')
+
+
+# Spalte einer Tabelle: Überschrift, Breite und Funktion, die den Zelltext aus einer Zeile liest
+@dataclass(slots=True, frozen=True)
+class Column:
+    title: str
+    width: float
+    value: Callable
+
+
+# Zeichnet Tabellen mit festen Spalten. Breiten und Spaltenpositionen werden einmal pro Tabelle berechnet,
+# jede Zeile wird mit einem einzigen Schreibvorgang ausgegeben. Bei einem Seitenumbruch wird die
+# Kopfzeile auf der neuen Seite wiederholt.
+class TableRenderer:
+    def __init__(self, columns, row_height=5, header_height=5, font_family="Arial", font_size=10):
+        self.columns = columns
+        self.titles = [column.title for column in columns]
+        self.widths = [column.width for column in columns]
+        self.getters = [column.value for column in columns]
+        self.row_height = row_height
+        self.header_height = header_height
+        self.font_family = font_family
+        self.font_size = font_size
+
+    def render(self, pdf, rows):
+        pdf.set_font(self.font_family, size=self.font_size)
+        positions = self.get_positions(pdf)
+        self.draw_row(pdf, positions, self.titles, self.header_height)
+        for row in rows:
+            if pdf.y + self.row_height > pdf.page_break_trigger:
+                pdf.add_page(pdf.cur_orientation)
+                pdf.set_font(self.font_family, size=self.font_size)
+                self.draw_row(pdf, positions, self.titles, self.header_height)
+            self.draw_row(pdf, positions, [getter(row) for getter in self.getters], self.row_height)
+
+    # Linke Kante, Breite und Textanfang jeder Spalte in PDF-Punkten
+    def get_positions(self, pdf):
+        positions = []
+        x = pdf.l_margin
+        for width in self.widths:
+            positions.append((x * pdf.k, width * pdf.k, (x + pdf.c_margin) * pdf.k))
+            x += width
+        return positions
+
+    def draw_row(self, pdf, positions, values, height):
+        if not FAST_PATH:
+            for width, value in zip(self.widths, values):
+                pdf.cell(width, height, txt=value or '', border=1)
+            pdf.ln(height)
+            return
+
+        k = pdf.k
+        top = (pdf.h - pdf.y) * k
+        bottom = -height * k
+        text_y = (pdf.h - (pdf.y + .5 * height + .3 * pdf.font_size)) * k
+        operations = []
+        for (left, width, text_x), value in zip(positions, values):
+            operations.append('%.2f %.2f %.2f %.2f re S' % (left, top, width, bottom))
+            if value:
+                operations.append('BT %.2f %.2f Td (%s) Tj ET' % (text_x, text_y, pdf._escape(value)))
+        pdf._out(' '.join(operations))
+        pdf.lasth = height
+        pdf.x = pdf.l_margin
+        pdf.y += height